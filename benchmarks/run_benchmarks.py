@@ -0,0 +1,383 @@
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from pathlib import Path
+from queue import Empty
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from maps_scraper import db, export, serialize  # noqa: E402
+
+SIZES = {
+    "small": {"destinations": 2, "cadence_minutes": 60, "years": 1},
+    "medium": {"destinations": 10, "cadence_minutes": 30, "years": 1},
+    "large": {"destinations": 20, "cadence_minutes": 15, "years": 2},
+}
+BENCH_YEAR = 2024
+ORIGIN = "Golden, CO"
+
+
+def load_script(name: str):
+    spec = importlib.util.spec_from_file_location(name, REPO_ROOT / "scripts" / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed_database(db_path: Path, size: dict) -> None:
+    env = dict(
+        os.environ,
+        MAPS_SCRAPER_DB=str(db_path),
+        MAPS_SCRAPER_ORIGIN=ORIGIN,
+        PYTHONPATH=str(REPO_ROOT),
+    )
+    subprocess.run(
+        [
+            sys.executable,
+            str(REPO_ROOT / "scripts" / "seed_fake_data.py"),
+            "--year",
+            str(BENCH_YEAR),
+            "--years",
+            str(size["years"]),
+            "--destinations",
+            str(size["destinations"]),
+            "--cadence-minutes",
+            str(size["cadence_minutes"]),
+        ],
+        check=True,
+        env=env,
+    )
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def directory_bytes(path: Path) -> int:
+    return sum(item.stat().st_size for item in path.rglob("*") if item.is_file())
+
+
+def destinations_of(db_path: str) -> list[str]:
+    conn = db.connect(db_path)
+    try:
+        return [
+            row[0]
+            for row in conn.execute(
+                "SELECT DISTINCT destination FROM travel_times WHERE origin = ? ORDER BY 1",
+                (ORIGIN,),
+            )
+        ]
+    finally:
+        conn.close()
+
+
+def bench_insert(db_path: str, workdir: Path) -> dict:
+    target = workdir / "insert.sqlite"
+    shutil.copyfile(db_path, target)
+    destinations = destinations_of(str(target))
+    start = datetime(BENCH_YEAR + 5, 1, 1, tzinfo=timezone.utc)
+    snapshots = 200
+    conn = db.connect(str(target))
+    try:
+        db.init_db(conn)
+        started = time.perf_counter()
+        for step in range(snapshots):
+            observed_at = (start + timedelta(minutes=15 * step)).isoformat()
+            db.insert_travel_times(
+                conn,
+                [
+                    row
+                    for destination in destinations
+                    for row in (
+                        (ORIGIN, destination, 3600, None, observed_at),
+                        (destination, ORIGIN, 3600, None, observed_at),
+                    )
+                ],
+            )
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+    return {"rows": snapshots * len(destinations) * 2, "seconds": elapsed, "output_bytes": 0}
+
+
+def bench_endpoints(db_path: str, workdir: Path) -> dict:
+    os.environ["MAPS_SCRAPER_DB"] = db_path
+    os.environ["MAPS_SCRAPER_ORIGIN"] = ORIGIN
+    from webapp.app import create_app
+
+    client = create_app().test_client()
+    destinations = destinations_of(db_path)
+    urls = []
+    for destination in destinations:
+        for direction in ("westbound", "eastbound"):
+            urls.append(f"/api/years?direction={direction}")
+            urls.append(
+                f"/api/calendar?destination={destination}&year={BENCH_YEAR}&direction={direction}"
+            )
+            urls.append(f"/api/profile?destination={destination}&direction={direction}")
+            for day in ("01-15", "04-15", "07-15", "10-15"):
+                urls.append(
+                    f"/api/day?destination={destination}&date={BENCH_YEAR}-{day}&direction={direction}"
+                )
+                urls.append(
+                    f"/api/best-departure?destination={destination}"
+                    f"&at={BENCH_YEAR}-{day}T07:00&direction={direction}"
+                )
+    results = {}
+    for name in ("years", "calendar", "day", "profile", "best-departure"):
+        selected = [url for url in urls if url.startswith(f"/api/{name}?")]
+        output_bytes = 0
+        started = time.perf_counter()
+        for url in selected:
+            response = client.get(url)
+            output_bytes += len(response.data)
+        results[name] = {
+            "requests": len(selected),
+            "seconds": time.perf_counter() - started,
+            "output_bytes": output_bytes,
+        }
+    return results
+
+
+def export_plan(conn) -> tuple[list, list[int]]:
+    build = load_script("build_static_site")
+    origin_entries, destinations, years, _ = build.export_index(conn, (ORIGIN,))
+    return export.export_targets(origin_entries, destinations), years
+
+
+def bench_exports(db_path: str, workdir: Path) -> dict:
+    conn = db.connect_readonly(db_path)
+    try:
+        rows = conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0]
+        targets, years = export_plan(conn)
+        out_dir = workdir / "export"
+        writer = export.SiteWriter(out_dir, {})
+        output_bytes = 0
+        started = time.perf_counter()
+        for relative, content in export.export_all(conn, targets, years):
+            writer.write(out_dir / relative, content)
+            output_bytes += len(content)
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+    return {"rows": rows, "seconds": elapsed, "output_bytes": output_bytes}
+
+
+def bench_serializers(db_path: str, workdir: Path) -> dict:
+    conn = db.connect_readonly(db_path)
+    try:
+        targets, _ = export_plan(conn)
+        by_trip: dict[tuple[str, str], list] = {}
+        for target in targets:
+            by_trip.setdefault(target.trip, []).append(target)
+        payloads = []
+        for trip, rows in export.stream_pairs(conn):
+            rows = list(rows)
+            for target in by_trip.get(trip, []):
+                payloads.extend(
+                    export.day_payload(target, day, day_rows)
+                    for day, day_rows in groupby(rows, key=lambda row: row[0])
+                )
+    finally:
+        conn.close()
+    rows = sum(len(payload["data"]) for payload in payloads)
+    backends = {
+        "json_indent": lambda payload: json.dumps(payload, indent=2).encode("utf-8"),
+        **serialize.SERIALIZERS,
+    }
+    results = {}
+    for name, dumps in backends.items():
+        started = time.perf_counter()
+        output_bytes = sum(len(dumps(payload)) for payload in payloads)
+        results[name] = {
+            "rows": rows,
+            "seconds": time.perf_counter() - started,
+            "output_bytes": output_bytes,
+        }
+    return results
+
+
+def bench_build(db_path: str, workdir: Path) -> dict:
+    build = load_script("build_static_site")
+    os.environ["MAPS_SCRAPER_ORIGIN"] = ORIGIN
+    out_dir = workdir / "site"
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        started = time.perf_counter()
+        build.build_static_site(db_path, out_dir, clean=True)
+        elapsed = time.perf_counter() - started
+    finally:
+        os.chdir(cwd)
+    conn = db.connect(db_path)
+    try:
+        rows = conn.execute("SELECT COUNT(*) FROM travel_times").fetchone()[0]
+    finally:
+        conn.close()
+    return {"rows": rows, "seconds": elapsed, "output_bytes": directory_bytes(out_dir)}
+
+
+BENCHMARKS = {
+    "insert_travel_times": bench_insert,
+    "flask_endpoints": bench_endpoints,
+    "export_functions": bench_exports,
+    "json_serializers": bench_serializers,
+    "build_static_site": bench_build,
+}
+
+
+RESULT_POLL_SECONDS = 1.0
+
+
+def run_isolated(name: str, db_path: str, workdir: str, queue) -> None:
+    result = BENCHMARKS[name](db_path, Path(workdir))
+    queue.put({"result": result, "peak_rss_bytes": peak_rss_bytes()})
+
+
+def run_benchmark(context, name: str, db_path: Path, workdir: Path) -> dict | None:
+    """Run one benchmark in a child process; None if the child failed."""
+    queue = context.Queue()
+    process = context.Process(
+        target=run_isolated, args=(name, str(db_path), str(workdir), queue)
+    )
+    process.start()
+    outcome = None
+    while outcome is None:
+        alive = process.is_alive()
+        try:
+            outcome = queue.get(timeout=RESULT_POLL_SECONDS)
+        except Empty:
+            # A child that exited without a result raised before queue.put.
+            if not alive:
+                break
+    process.join()
+    if process.exitcode != 0:
+        return None
+    return outcome
+
+
+def summarize(outcome: dict) -> dict | dict[str, dict]:
+    result = outcome["result"]
+    entries = result if "seconds" not in result else {"": result}
+    summary = {}
+    for key, entry in entries.items():
+        unit = "rows" if "rows" in entry else "requests"
+        summary[key] = {
+            **entry,
+            f"{unit}_per_second": entry[unit] / entry["seconds"] if entry["seconds"] else None,
+            "peak_rss_bytes": outcome["peak_rss_bytes"],
+        }
+    return summary[""] if "" in summary else summary
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=REPO_ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict) and "seconds" in value:
+            flat[f"{prefix}{key}"] = value["seconds"]
+        elif isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+    return flat
+
+
+def compare(current: dict, baseline_path: Path) -> None:
+    baseline = flatten(json.loads(baseline_path.read_text())["results"])
+    for key, seconds in flatten(current).items():
+        if key in baseline and baseline[key]:
+            ratio = seconds / baseline[key]
+            print(f"{key:60s} {baseline[key]:9.3f}s -> {seconds:9.3f}s  x{ratio:5.2f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scrape, query and static-build hot paths.",
+    )
+    parser.add_argument(
+        "--sizes",
+        default="small,medium",
+        help=f"Comma-separated dataset sizes to run ({', '.join(SIZES)}).",
+    )
+    parser.add_argument(
+        "--only",
+        default=",".join(BENCHMARKS),
+        help="Comma-separated benchmarks to run.",
+    )
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument(
+        "--compare", default=None, help="Previous results JSON to compare against."
+    )
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results: dict[str, dict] = {}
+    failed: list[str] = []
+    with tempfile.TemporaryDirectory(prefix="mdt-bench-") as tmp:
+        for size_name in args.sizes.split(","):
+            size = SIZES[size_name]
+            size_dir = Path(tmp) / size_name
+            size_dir.mkdir()
+            db_path = size_dir / "travel.sqlite"
+            seed_started = time.perf_counter()
+            seed_database(db_path, size)
+            results[size_name] = {
+                "dataset": {
+                    **size,
+                    "seed_seconds": time.perf_counter() - seed_started,
+                    "db_bytes": db_path.stat().st_size,
+                }
+            }
+            for name in args.only.split(","):
+                outcome = run_benchmark(context, name, db_path, size_dir)
+                if outcome is None:
+                    failed.append(f"{size_name}/{name}")
+                    results[size_name][name] = {"error": "benchmark process failed"}
+                    print(f"{size_name:8s} {name:22s} FAILED", file=sys.stderr)
+                    continue
+                results[size_name][name] = summarize(outcome)
+                print(f"{size_name:8s} {name:22s} done", file=sys.stderr)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "sqlite": db.sqlite3.sqlite_version,
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.compare:
+        compare(results, Path(args.compare))
+    if failed:
+        print(f"Failed benchmarks: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
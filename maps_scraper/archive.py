@@ -0,0 +1,174 @@
+import re
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+from maps_scraper import db
+
+DEFAULT_RETENTION_DAYS = 400
+ARCHIVE_NAME_PATTERN = re.compile(r"^travel_times-(\d{4})\.sqlite$")
+ARCHIVE_SCHEMA_PATTERN = re.compile(r"^archive_(\d{4})$")
+
+
+def default_archive_dir(db_path: str) -> Path:
+    return Path(db_path).parent / "archive"
+
+
+def archive_path(archive_dir: Path, year: int) -> Path:
+    return Path(archive_dir) / f"travel_times-{year}.sqlite"
+
+
+def archive_years(archive_dir: Path) -> list[int]:
+    archive_dir = Path(archive_dir)
+    if not archive_dir.is_dir():
+        return []
+    return sorted(
+        int(match.group(1))
+        for match in map(ARCHIVE_NAME_PATTERN.match, (p.name for p in archive_dir.iterdir()))
+        if match
+    )
+
+
+def archive_cutoff(today: date, retention_days: int) -> str:
+    if retention_days < 1:
+        raise ValueError("retention_days must be at least 1")
+    # Round down to a month boundary so archive files change at most monthly.
+    cutoff = date.fromordinal(today.toordinal() - retention_days)
+    return cutoff.replace(day=1).isoformat()
+
+
+def _create_archive(path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Rollback journal rather than WAL: archives are committed as single files.
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode = DELETE")
+        db.create_observation_schema(conn)
+        db.create_travel_times_view(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def archive_old_observations(
+    conn: sqlite3.Connection, archive_dir: Path, cutoff: str
+) -> dict[int, int]:
+    years = [
+        row[0]
+        for row in conn.execute(
+            """
+            SELECT DISTINCT local_year
+            FROM observations
+            WHERE local_date < ?
+            ORDER BY local_year
+            """,
+            (cutoff,),
+        )
+    ]
+    archived: dict[int, int] = {}
+    for year in years:
+        path = archive_path(archive_dir, year)
+        _create_archive(path)
+        conn.execute("ATTACH DATABASE ? AS archive", (str(path),))
+        try:
+            # Copy before deleting: an interrupted run leaves duplicates that
+            # the next run overwrites, never lost rows.
+            conn.execute(
+                "INSERT OR REPLACE INTO archive.locations SELECT id, name FROM main.locations"
+            )
+            archived[year] = conn.execute(
+                """
+                INSERT OR REPLACE INTO archive.observations
+                SELECT * FROM main.observations
+                WHERE local_year = ? AND local_date < ?
+                """,
+                (year, cutoff),
+            ).rowcount
+            conn.execute("ANALYZE archive.observations")
+            conn.commit()
+            conn.execute(
+                "DELETE FROM main.observations WHERE local_year = ? AND local_date < ?",
+                (year, cutoff),
+            )
+            conn.commit()
+        except BaseException:
+            # DETACH fails with "database is locked" inside an open
+            # transaction, which would mask the original error.
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("DETACH DATABASE archive")
+    if cutoff > (db.get_archived_before(conn) or ""):
+        db.set_archived_before(conn, cutoff)
+        conn.commit()
+    if any(archived.values()):
+        # Profiles cover hot rows only. The rebuild also bumps the data
+        # revision, so cached API responses are not served for moved rows.
+        db.rebuild_hour_profiles(conn)
+        db.update_planner_stats(conn)
+        conn.commit()
+    return archived
+
+
+def attach_archives(
+    conn: sqlite3.Connection, archive_dir: Path | None, readonly: bool = True
+) -> list[int]:
+    years = archive_years(archive_dir) if archive_dir else []
+    if not years:
+        return []
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if len(years) > limit:
+        raise ValueError(
+            f"{len(years)} archive files exceed SQLite's limit of {limit} attached databases"
+        )
+    for year in years:
+        path = archive_path(archive_dir, year)
+        # Read-only attaches need a connection opened with uri=True.
+        target = f"{path.resolve().as_uri()}?mode=ro" if readonly else str(path)
+        conn.execute(f"ATTACH DATABASE ? AS archive_{year}", (target,))
+    _create_union_view(conn, years)
+    return years
+
+
+def attached_archive_years(conn: sqlite3.Connection) -> list[int]:
+    return sorted(
+        int(match.group(1))
+        for match in (
+            ARCHIVE_SCHEMA_PATTERN.match(row[1])
+            for row in conn.execute("PRAGMA database_list")
+        )
+        if match
+    )
+
+
+def sync_archives(
+    conn: sqlite3.Connection, archive_dir: Path | None, readonly: bool = True
+) -> list[int]:
+    """Re-attach when archive files appeared or went away since the last attach."""
+    attached = attached_archive_years(conn)
+    years = archive_years(archive_dir) if archive_dir else []
+    if attached == years:
+        return years
+    for year in attached:
+        conn.execute(f"DETACH DATABASE archive_{year}")
+    if not years:
+        _create_union_view(conn, [])
+        return []
+    return attach_archives(conn, archive_dir, readonly)
+
+
+def _create_union_view(conn: sqlite3.Connection, years: list[int]) -> None:
+    selects = [db.travel_times_select("main")] + [
+        db.travel_times_select(f"archive_{year}") for year in years
+    ]
+    # A temp view shadows main.travel_times, so readers see archived rows too.
+    query_only = conn.execute("PRAGMA query_only").fetchone()[0]
+    conn.execute("PRAGMA query_only = OFF")
+    try:
+        conn.execute("DROP VIEW IF EXISTS temp.travel_times")
+        if years:
+            conn.execute(
+                f"CREATE TEMP VIEW travel_times AS {' UNION ALL '.join(selects)}"
+            )
+    finally:
+        conn.execute(f"PRAGMA query_only = {query_only}")
@@ -4,37 +4,73 @@ from dotenv import load_dotenv
 from dataclasses import dataclass
 
 
+def split_places(value: str) -> tuple[str, ...]:
+    return tuple(dict.fromkeys(place.strip() for place in value.split(";") if place.strip()))
+
+
+def load_origins() -> tuple[str, ...]:
+    origins = split_places(os.getenv("MAPS_SCRAPER_ORIGINS", ""))
+    return origins or (os.getenv("MAPS_SCRAPER_ORIGIN", "Golden, CO").strip(),)
+
+
 @dataclass(frozen=True)
 class Config:
     api_key: str
     db_path: str
-    origin: str
+    origins: tuple[str, ...]
     destinations: tuple[str, ...]
     interval_seconds: int
+    timezone: str = "America/Denver"
+    max_in_flight: int = 8
+    rate_per_second: float = 10.0
+    jitter_seconds: float = 0.0
+    missed_slots: str = "skip"
+    sampling: str = "fixed"
+    element_budget_per_hour: float = 60.0
+    min_interval_seconds: int = 900
+
+    @property
+    def origin(self) -> str:
+        return self.origins[0]
 
 
 def load_config() -> Config:
     load_dotenv()
     api_key = os.getenv("GOOGLE_MAPS_API_KEY", "").strip()
     db_path = os.getenv("MAPS_SCRAPER_DB", "./data/travel_times.sqlite")
-    origin = os.getenv("MAPS_SCRAPER_ORIGIN", "Golden, CO")
-    destinations = tuple(
-        d.strip()
-        for d in os.getenv(
-            "MAPS_SCRAPER_DESTINATIONS",
-            "Frisco, CO;Winter Park, CO",
-        ).split(";")
-        if d.strip()
+    origins = load_origins()
+    destinations = split_places(
+        os.getenv("MAPS_SCRAPER_DESTINATIONS", "Frisco, CO;Winter Park, CO")
     )
     interval_seconds = int(os.getenv("MAPS_SCRAPER_INTERVAL_SECONDS", "3600"))
+    timezone = os.getenv("MAPS_SCRAPER_TIMEZONE", "America/Denver").strip()
+    max_in_flight = int(os.getenv("MAPS_SCRAPER_MAX_IN_FLIGHT", "8"))
+    rate_per_second = float(os.getenv("MAPS_SCRAPER_RATE_PER_SECOND", "10"))
+    jitter_seconds = float(os.getenv("MAPS_SCRAPER_JITTER_SECONDS", "0"))
+    missed_slots = os.getenv("MAPS_SCRAPER_MISSED_SLOTS", "skip").strip()
+    sampling = os.getenv("MAPS_SCRAPER_SAMPLING", "fixed").strip()
+    element_budget_per_hour = float(
+        os.getenv("MAPS_SCRAPER_ELEMENT_BUDGET_PER_HOUR", "60")
+    )
+    min_interval_seconds = int(os.getenv("MAPS_SCRAPER_MIN_INTERVAL_SECONDS", "900"))
 
     if not api_key:
         raise ValueError("GOOGLE_MAPS_API_KEY is required")
+    if sampling not in ("fixed", "adaptive"):
+        raise ValueError("MAPS_SCRAPER_SAMPLING must be 'fixed' or 'adaptive'")
 
     return Config(
         api_key=api_key,
         db_path=db_path,
-        origin=origin,
+        origins=origins,
         destinations=destinations,
         interval_seconds=interval_seconds,
+        timezone=timezone,
+        max_in_flight=max_in_flight,
+        rate_per_second=rate_per_second,
+        jitter_seconds=jitter_seconds,
+        missed_slots=missed_slots,
+        sampling=sampling,
+        element_budget_per_hour=element_budget_per_hour,
+        min_interval_seconds=min_interval_seconds,
     )
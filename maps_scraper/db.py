@@ -1,16 +1,421 @@
+import logging
+import math
 import sqlite3
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from itertools import groupby
 from pathlib import Path
 from typing import Iterable
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEZONE = "America/Denver"
+LEGACY_UTC_OFFSET_HOURS = -7
+
+READ_MMAP_BYTES = 256 * 1024 * 1024
+READ_CACHE_KIB = 16 * 1024
+ANALYSIS_ROW_LIMIT = 1000
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
 
 
 def connect(db_path: str) -> sqlite3.Connection:
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(db_path)
     conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    return conn
+
+
+def connect_readonly(db_path: str) -> sqlite3.Connection:
+    # Readers may be pooled across threads; each is used by one thread at a time.
+    conn = sqlite3.connect(
+        f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA mmap_size = {READ_MMAP_BYTES}")
+    conn.execute(f"PRAGMA cache_size = -{READ_CACHE_KIB}")
     return conn
 
 
-def init_db(conn: sqlite3.Connection) -> None:
+@lru_cache(maxsize=None)
+def load_timezone(name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError) as exc:
+        raise ValueError(f"Unknown timezone: {name}") from exc
+
+
+def parse_observed_at(observed_at: str) -> datetime:
+    moment = datetime.fromisoformat(observed_at)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def epoch_local_columns(epoch: int, tz: ZoneInfo) -> tuple[str, int, int, int, int]:
+    local = datetime.fromtimestamp(epoch, tz)
+    return (
+        local.date().isoformat(),
+        local.year,
+        local.hour,
+        local.weekday(),
+        int(local.utcoffset().total_seconds()) // 60,
+    )
+
+
+def local_time_columns(
+    observed_at: str, tz: ZoneInfo
+) -> tuple[int, str, int, int, int, int]:
+    epoch = int(parse_observed_at(observed_at).timestamp())
+    return (epoch,) + epoch_local_columns(epoch, tz)
+
+
+def local_iso_sql(
+    epoch_column: str = "observed_epoch", offset_column: str = "utc_offset_minutes"
+) -> str:
+    return (
+        f"strftime('%Y-%m-%dT%H:%M:%S', {epoch_column} + {offset_column} * 60, 'unixepoch')"
+        f" || printf('%s%02d:%02d', CASE WHEN {offset_column} < 0 THEN '-' ELSE '+' END,"
+        f" abs({offset_column}) / 60, abs({offset_column}) % 60)"
+    )
+
+
+@lru_cache(maxsize=4096)
+def _epoch_day_iso(day_number: int) -> str:
+    return date.fromordinal(EPOCH_ORDINAL + day_number).isoformat()
+
+
+def local_iso(epoch: int, offset_minutes: int) -> str:
+    # Mirrors local_iso_sql for rows formatted in Python.
+    day_number, seconds = divmod(epoch + offset_minutes * 60, 86400)
+    hour, seconds = divmod(seconds, 3600)
+    minute, second = divmod(seconds, 60)
+    sign = "-" if offset_minutes < 0 else "+"
+    offset_hours, offset_rest = divmod(abs(offset_minutes), 60)
+    return (
+        f"{_epoch_day_iso(day_number)}T{hour:02d}:{minute:02d}:{second:02d}"
+        f"{sign}{offset_hours:02d}:{offset_rest:02d}"
+    )
+
+
+def get_timezone_name(conn: sqlite3.Connection) -> str:
+    row = conn.execute("SELECT value FROM settings WHERE key = 'timezone'").fetchone()
+    return row[0] if row else DEFAULT_TIMEZONE
+
+
+def get_archived_before(conn: sqlite3.Connection) -> str | None:
+    row = conn.execute(
+        "SELECT value FROM settings WHERE key = 'archived_before'"
+    ).fetchone()
+    return row[0] if row else None
+
+
+def set_archived_before(conn: sqlite3.Connection, local_date: str) -> None:
+    conn.execute(
+        """
+        INSERT INTO settings (key, value) VALUES ('archived_before', ?)
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        """,
+        (local_date,),
+    )
+
+
+def rebucket_local_time(conn: sqlite3.Connection, timezone_name: str) -> None:
+    tz = load_timezone(timezone_name)
+    rows = conn.execute(
+        "SELECT origin_id, destination_id, observed_epoch FROM observations"
+    ).fetchall()
+    conn.executemany(
+        """
+        UPDATE observations
+        SET local_date = ?,
+            local_year = ?,
+            local_hour = ?,
+            local_weekday = ?,
+            utc_offset_minutes = ?
+        WHERE origin_id = ? AND destination_id = ? AND observed_epoch = ?
+        """,
+        (epoch_local_columns(row[2], tz) + row for row in rows),
+    )
+
+
+def _rebucket_legacy_rows(conn: sqlite3.Connection, timezone_name: str) -> None:
+    tz = load_timezone(timezone_name)
+    rows = conn.execute("SELECT id, observed_epoch FROM travel_times").fetchall()
+    conn.executemany(
+        """
+        UPDATE travel_times
+        SET local_date = ?,
+            local_year = ?,
+            local_hour = ?,
+            local_weekday = ?,
+            utc_offset_minutes = ?
+        WHERE id = ?
+        """,
+        (epoch_local_columns(epoch, tz) + (row_id,) for row_id, epoch in rows),
+    )
+
+
+def _migrate_local_time_columns(conn: sqlite3.Connection) -> None:
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(travel_times)")}
+    for name, declaration in (
+        ("observed_epoch", "INTEGER"),
+        ("local_date", "TEXT"),
+        ("local_year", "INTEGER"),
+    ):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE travel_times ADD COLUMN {name} {declaration}")
+
+    offset = f"'{LEGACY_UTC_OFFSET_HOURS:+d} hours'"
+    conn.execute(
+        f"""
+        UPDATE travel_times
+        SET observed_epoch = CAST(strftime('%s', observed_at) AS INTEGER),
+            local_date = date(observed_at, {offset}),
+            local_year = CAST(strftime('%Y', observed_at, {offset}) AS INTEGER)
+        WHERE observed_epoch IS NULL
+        """
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_travel_times_lookup")
+    conn.execute("DROP INDEX IF EXISTS idx_travel_times_origin_dest_time")
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_travel_times_origin_dest_local
+        ON travel_times (origin, destination, local_date, observed_epoch)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_travel_times_origin_year
+        ON travel_times (origin, local_year)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_travel_times_destination_year
+        ON travel_times (destination, local_year)
+        """
+    )
+
+
+def _migrate_daily_summary(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS daily_summary (
+            origin TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            local_date TEXT NOT NULL,
+            max_duration INTEGER NOT NULL,
+            min_duration INTEGER NOT NULL,
+            mean_duration REAL NOT NULL,
+            sample_count INTEGER NOT NULL,
+            p90_duration INTEGER NOT NULL,
+            PRIMARY KEY (origin, destination, local_date)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _migrate_summary_revision(conn: sqlite3.Connection) -> None:
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(daily_summary)")}
+    if "revision" not in columns:
+        conn.execute(
+            "ALTER TABLE daily_summary ADD COLUMN revision INTEGER NOT NULL DEFAULT 1"
+        )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_daily_summary_revision
+        ON daily_summary (revision)
+        """
+    )
+
+
+def _migrate_local_time_dimension(conn: sqlite3.Connection) -> None:
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(travel_times)")}
+    for name in ("local_hour", "local_weekday", "utc_offset_minutes"):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE travel_times ADD COLUMN {name} INTEGER")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        "INSERT OR IGNORE INTO settings (key, value) VALUES ('timezone', ?)",
+        (DEFAULT_TIMEZONE,),
+    )
+    _rebucket_legacy_rows(conn, get_timezone_name(conn))
+
+
+def _migrate_element_failures(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS element_failures (
+            origin TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            status TEXT NOT NULL,
+            first_failed_at TEXT NOT NULL,
+            last_failed_at TEXT NOT NULL,
+            failure_count INTEGER NOT NULL,
+            PRIMARY KEY (origin, destination)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def create_observation_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS locations (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS observations (
+            origin_id INTEGER NOT NULL REFERENCES locations (id),
+            destination_id INTEGER NOT NULL REFERENCES locations (id),
+            observed_epoch INTEGER NOT NULL,
+            duration_seconds INTEGER NOT NULL,
+            distance_meters INTEGER,
+            local_date TEXT NOT NULL,
+            local_year INTEGER NOT NULL,
+            local_hour INTEGER NOT NULL,
+            local_weekday INTEGER NOT NULL,
+            utc_offset_minutes INTEGER NOT NULL,
+            PRIMARY KEY (origin_id, destination_id, observed_epoch)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_observations_pair_local
+        ON observations (origin_id, destination_id, local_date)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_observations_origin_year
+        ON observations (origin_id, local_year)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_observations_destination_year
+        ON observations (destination_id, local_year)
+        """
+    )
+
+
+def travel_times_select(schema: str = "") -> str:
+    prefix = f"{schema}." if schema else ""
+    return f"""
+        SELECT lo.name AS origin,
+               ld.name AS destination,
+               o.duration_seconds,
+               o.distance_meters,
+               strftime('%Y-%m-%dT%H:%M:%S+00:00', o.observed_epoch, 'unixepoch')
+                   AS observed_at,
+               o.observed_epoch,
+               o.local_date,
+               o.local_year,
+               o.local_hour,
+               o.local_weekday,
+               o.utc_offset_minutes
+        FROM {prefix}observations o
+        JOIN {prefix}locations lo ON lo.id = o.origin_id
+        JOIN {prefix}locations ld ON ld.id = o.destination_id
+        """
+
+
+def create_travel_times_view(conn: sqlite3.Connection) -> None:
+    # The view keeps the original text-keyed columns for every reader.
+    conn.execute(f"CREATE VIEW IF NOT EXISTS travel_times AS {travel_times_select()}")
+
+
+def _migrate_locations(conn: sqlite3.Connection) -> None:
+    create_observation_schema(conn)
+    legacy_rows = conn.execute("SELECT COUNT(*) FROM travel_times").fetchone()[0]
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO locations (name)
+        SELECT origin FROM travel_times
+        UNION
+        SELECT destination FROM travel_times
+        ORDER BY 1
+        """
+    )
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO observations
+        SELECT lo.id, ld.id, t.observed_epoch, t.duration_seconds, t.distance_meters,
+               t.local_date, t.local_year, t.local_hour, t.local_weekday,
+               t.utc_offset_minutes
+        FROM travel_times t
+        JOIN locations lo ON lo.name = t.origin
+        JOIN locations ld ON ld.name = t.destination
+        ORDER BY t.id
+        """
+    )
+    # Rows sharing a pair and a whole second collapse onto one primary key;
+    # the latest id wins.
+    migrated = conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0]
+    collapsed = legacy_rows - migrated
+    if collapsed:
+        logger.warning(
+            "collapsed %d of %d travel_times rows that shared a pair and second",
+            collapsed,
+            legacy_rows,
+        )
+    conn.execute("DROP TABLE travel_times")
+    create_travel_times_view(conn)
+
+
+def _migrate_hour_profiles(conn: sqlite3.Connection) -> None:
+    # Covering index: one bucket's durations come back already sorted.
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_observations_pair_hour
+        ON observations (origin_id, destination_id, local_weekday, local_hour, duration_seconds)
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS hour_profile (
+            origin TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            local_weekday INTEGER NOT NULL,
+            local_hour INTEGER NOT NULL,
+            sample_count INTEGER NOT NULL,
+            mean_duration REAL NOT NULL,
+            p50_duration INTEGER NOT NULL,
+            p90_duration INTEGER NOT NULL,
+            max_duration INTEGER NOT NULL,
+            PRIMARY KEY (origin, destination, local_weekday, local_hour)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+MIGRATIONS = (
+    _migrate_local_time_columns,
+    _migrate_daily_summary,
+    _migrate_summary_revision,
+    _migrate_local_time_dimension,
+    _migrate_element_failures,
+    _migrate_locations,
+    _migrate_hour_profiles,
+)
+
+
+def init_db(conn: sqlite3.Connection, timezone_name: str | None = None) -> None:
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS travel_times (
@@ -23,31 +428,430 @@ def init_db(conn: sqlite3.Connection) -> None:
         )
         """
     )
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        migration(conn)
+        conn.execute(f"PRAGMA user_version = {target}")
+    rebuild = version < len(MIGRATIONS)
+    if timezone_name and timezone_name != get_timezone_name(conn):
+        load_timezone(timezone_name)
+        conn.execute(
+            """
+            INSERT INTO settings (key, value) VALUES ('timezone', ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value
+            """,
+            (timezone_name,),
+        )
+        rebucket_local_time(conn, timezone_name)
+        rebuild = True
+    if rebuild:
+        rebuild_daily_summary(conn)
+        rebuild_hour_profiles(conn)
+    # ANALYZE is not free; every reader and writer opens through here.
+    if rebuild or not has_planner_stats(conn):
+        update_planner_stats(conn)
+    conn.commit()
+
+
+def has_planner_stats(conn: sqlite3.Connection) -> bool:
+    if not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+    ).fetchone():
+        return False
+    return (
+        conn.execute(
+            "SELECT 1 FROM sqlite_stat1 WHERE tbl = 'observations' LIMIT 1"
+        ).fetchone()
+        is not None
+    )
+
+
+def update_planner_stats(conn: sqlite3.Connection) -> None:
+    # Without stats SQLite prefers the (origin_id, destination_id) primary key
+    # prefix over the local_date index and scans a pair's whole history.
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_ROW_LIMIT}")
+    conn.execute("ANALYZE observations")
+
+
+def percentile(sorted_values: list[int], fraction: float) -> int:
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize_durations(sorted_values: list[int]) -> tuple[int, int, float, int, int]:
+    return (
+        sorted_values[-1],
+        sorted_values[0],
+        sum(sorted_values) / len(sorted_values),
+        len(sorted_values),
+        percentile(sorted_values, 0.9),
+    )
+
+
+def data_revision(conn: sqlite3.Connection) -> int:
+    # Summary upserts stamp their rows; other changes (archiving, profile
+    # rebuilds) raise the floor kept in settings.
+    return conn.execute(
+        """
+        SELECT MAX(
+            COALESCE((SELECT MAX(revision) FROM daily_summary), 0),
+            COALESCE(
+                (SELECT CAST(value AS INTEGER) FROM settings WHERE key = 'data_revision'),
+                0
+            )
+        )
+        """
+    ).fetchone()[0]
+
+
+def bump_data_revision(conn: sqlite3.Connection) -> int:
+    revision = data_revision(conn) + 1
     conn.execute(
         """
-        CREATE INDEX IF NOT EXISTS idx_travel_times_lookup
-        ON travel_times (destination, observed_at)
+        INSERT INTO settings (key, value) VALUES ('data_revision', ?)
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        """,
+        (str(revision),),
+    )
+    return revision
+
+
+def changed_days(
+    conn: sqlite3.Connection, since_revision: int
+) -> list[tuple[str, str, str]]:
+    return [
+        tuple(row)
+        for row in conn.execute(
+            """
+            SELECT origin, destination, local_date
+            FROM daily_summary
+            WHERE revision > ?
+            ORDER BY origin, destination, local_date
+            """,
+            (since_revision,),
+        )
+    ]
+
+
+def _upsert_daily_summary(
+    conn: sqlite3.Connection,
+    summaries: Iterable[tuple[str, str, str, int, int, float, int, int]],
+    revision: int,
+) -> None:
+    conn.executemany(
         """
+        INSERT INTO daily_summary (
+            origin, destination, local_date,
+            max_duration, min_duration, mean_duration, sample_count, p90_duration,
+            revision
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (origin, destination, local_date) DO UPDATE SET
+            max_duration = excluded.max_duration,
+            min_duration = excluded.min_duration,
+            mean_duration = excluded.mean_duration,
+            sample_count = excluded.sample_count,
+            p90_duration = excluded.p90_duration,
+            revision = excluded.revision
+        """,
+        (summary + (revision,) for summary in summaries),
     )
+
+
+def refresh_daily_summary(
+    conn: sqlite3.Connection, keys: Iterable[tuple[str, str, str]]
+) -> None:
+    summaries = []
+    for origin, destination, local_date in keys:
+        durations = [
+            row[0]
+            for row in conn.execute(
+                """
+                SELECT duration_seconds
+                FROM travel_times
+                WHERE origin = ?
+                  AND destination = ?
+                  AND local_date = ?
+                ORDER BY duration_seconds
+                """,
+                (origin, destination, local_date),
+            )
+        ]
+        if durations:
+            summaries.append(
+                (origin, destination, local_date) + summarize_durations(durations)
+            )
+    _upsert_daily_summary(conn, summaries, data_revision(conn) + 1)
+
+
+def rebuild_daily_summary(conn: sqlite3.Connection) -> None:
+    revision = data_revision(conn) + 1
+    # Archived days have no raw rows left here; their summaries are kept.
+    archived_before = get_archived_before(conn) or ""
     conn.execute(
+        "DELETE FROM daily_summary WHERE local_date >= ?", (archived_before,)
+    )
+    rows = conn.execute(
         """
-        CREATE INDEX IF NOT EXISTS idx_travel_times_origin_dest_time
-        ON travel_times (origin, destination, observed_at)
+        SELECT origin, destination, local_date, duration_seconds
+        FROM travel_times
+        WHERE local_date >= ?
+        ORDER BY origin, destination, local_date, duration_seconds
+        """,
+        (archived_before,),
+    )
+    _upsert_daily_summary(
+        conn,
+        (
+            key + summarize_durations([row[3] for row in group])
+            for key, group in groupby(rows, key=lambda row: row[:3])
+        ),
+        revision,
+    )
+
+
+def summarize_profile(sorted_values: list[int]) -> tuple[int, float, int, int, int]:
+    return (
+        len(sorted_values),
+        sum(sorted_values) / len(sorted_values),
+        percentile(sorted_values, 0.5),
+        percentile(sorted_values, 0.9),
+        sorted_values[-1],
+    )
+
+
+def _upsert_hour_profiles(
+    conn: sqlite3.Connection,
+    profiles: Iterable[tuple[str, str, int, int, int, float, int, int, int]],
+) -> None:
+    conn.executemany(
         """
+        INSERT INTO hour_profile (
+            origin, destination, local_weekday, local_hour,
+            sample_count, mean_duration, p50_duration, p90_duration, max_duration
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (origin, destination, local_weekday, local_hour) DO UPDATE SET
+            sample_count = excluded.sample_count,
+            mean_duration = excluded.mean_duration,
+            p50_duration = excluded.p50_duration,
+            p90_duration = excluded.p90_duration,
+            max_duration = excluded.max_duration
+        """,
+        profiles,
+    )
+
+
+def refresh_hour_profiles(
+    conn: sqlite3.Connection, keys: Iterable[tuple[str, str, int, int]]
+) -> None:
+    profiles = []
+    for key in keys:
+        durations = [
+            row[0]
+            for row in conn.execute(
+                """
+                SELECT duration_seconds
+                FROM travel_times
+                WHERE origin = ?
+                  AND destination = ?
+                  AND local_weekday = ?
+                  AND local_hour = ?
+                ORDER BY duration_seconds
+                """,
+                key,
+            )
+        ]
+        if durations:
+            profiles.append(key + summarize_profile(durations))
+    _upsert_hour_profiles(conn, profiles)
+
+
+def rebuild_hour_profiles(conn: sqlite3.Connection) -> None:
+    # Profiles cover the raw rows in this database, i.e. the retention window.
+    removed = conn.execute("DELETE FROM hour_profile").rowcount
+    names = dict(conn.execute("SELECT id, name FROM locations").fetchall())
+    rows = conn.execute(
+        """
+        SELECT origin_id, destination_id, local_weekday, local_hour, duration_seconds
+        FROM observations
+        ORDER BY origin_id, destination_id, local_weekday, local_hour, duration_seconds
+        """
+    )
+    _upsert_hour_profiles(
+        conn,
+        (
+            (names[key[0]], names[key[1]], key[2], key[3])
+            + summarize_profile([row[4] for row in group])
+            for key, group in groupby(rows, key=lambda row: row[:4])
+        ),
+    )
+    if removed or conn.execute("SELECT 1 FROM hour_profile LIMIT 1").fetchone():
+        bump_data_revision(conn)
+
+
+def profile_entry(row: Iterable) -> dict:
+    weekday, hour, count, mean, p50, p90, maximum = row
+    return {
+        "weekday": weekday,
+        "hour": hour,
+        "count": count,
+        "mean": round(mean),
+        "p50": p50,
+        "p90": p90,
+        "max": maximum,
+    }
+
+
+def hour_profile(conn: sqlite3.Connection, origin: str, destination: str) -> list[dict]:
+    return [
+        profile_entry(row)
+        for row in conn.execute(
+            """
+            SELECT local_weekday, local_hour, sample_count, mean_duration,
+                   p50_duration, p90_duration, max_duration
+            FROM hour_profile
+            WHERE origin = ? AND destination = ?
+            ORDER BY local_weekday, local_hour
+            """,
+            (origin, destination),
+        )
+    ]
+
+
+def duration_volatility(
+    conn: sqlite3.Connection, since_epoch: int, min_samples: int = 3
+) -> dict[tuple[str, str, int, int], float]:
+    rows = conn.execute(
+        """
+        SELECT origin, destination, local_weekday, local_hour,
+               AVG(duration_seconds), AVG(duration_seconds * duration_seconds)
+        FROM travel_times
+        WHERE observed_epoch >= ?
+        GROUP BY origin, destination, local_weekday, local_hour
+        HAVING COUNT(*) >= ?
+        """,
+        (since_epoch, min_samples),
+    )
+    return {
+        (origin, destination, weekday, hour): math.sqrt(max(mean_square - mean * mean, 0.0))
+        for origin, destination, weekday, hour, mean, mean_square in rows
+    }
+
+
+def location_id(
+    conn: sqlite3.Connection, name: str, cache: dict[str, int] | None = None
+) -> int:
+    if cache is not None and name in cache:
+        return cache[name]
+    conn.execute("INSERT OR IGNORE INTO locations (name) VALUES (?)", (name,))
+    row = conn.execute("SELECT id FROM locations WHERE name = ?", (name,)).fetchone()
+    if cache is not None:
+        cache[name] = row[0]
+    return row[0]
+
+
+def bulk_insert_travel_times(
+    conn: sqlite3.Connection,
+    rows: Iterable[tuple[str, str, int, int | None, str, int, str, int, int, int, int]],
+) -> None:
+    # Ids are cached per call only: a rolled-back batch can discard new locations.
+    locations: dict[str, int] = {}
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO observations (
+            origin_id, destination_id, observed_epoch, duration_seconds,
+            distance_meters, local_date, local_year, local_hour, local_weekday,
+            utc_offset_minutes
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            (
+                location_id(conn, row[0], locations),
+                location_id(conn, row[1], locations),
+                row[5],
+                row[2],
+                row[3],
+            )
+            + row[6:]
+            for row in rows
+        ),
     )
-    conn.commit()
 
 
 def insert_travel_times(
     conn: sqlite3.Connection,
     rows: Iterable[tuple[str, str, int, int | None, str]],
+    commit: bool = True,
+    tz: ZoneInfo | None = None,
+) -> None:
+    tz = tz or load_timezone(get_timezone_name(conn))
+    touched: dict[tuple[str, str, str], None] = {}
+    touched_hours: dict[tuple[str, str, int, int], None] = {}
+
+    def params():
+        for row in rows:
+            local = local_time_columns(row[4], tz)
+            touched[(row[0], row[1], local[1])] = None
+            touched_hours[(row[0], row[1], local[4], local[3])] = None
+            yield row + local
+
+    bulk_insert_travel_times(conn, params())
+    refresh_daily_summary(conn, touched)
+    refresh_hour_profiles(conn, touched_hours)
+    if commit:
+        conn.commit()
+
+
+def record_element_status(
+    conn: sqlite3.Connection,
+    succeeded: Iterable[tuple[str, str]],
+    failures: Iterable[tuple[str, str, str, str]],
 ) -> None:
+    conn.executemany(
+        "DELETE FROM element_failures WHERE origin = ? AND destination = ?",
+        succeeded,
+    )
     conn.executemany(
         """
-        INSERT INTO travel_times (
-            origin, destination, duration_seconds, distance_meters, observed_at
-        ) VALUES (?, ?, ?, ?, ?)
+        INSERT INTO element_failures (
+            origin, destination, status, first_failed_at, last_failed_at, failure_count
+        ) VALUES (?1, ?2, ?3, ?4, ?4, 1)
+        ON CONFLICT (origin, destination) DO UPDATE SET
+            status = excluded.status,
+            last_failed_at = excluded.last_failed_at,
+            failure_count = failure_count + 1
         """,
-        list(rows),
+        failures,
     )
-    conn.commit()
+
+
+class TravelTimeWriter:
+    def __init__(self, db_path: str, timezone_name: str | None = None) -> None:
+        self.conn = connect(db_path)
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        init_db(self.conn, timezone_name)
+        self.tz = load_timezone(get_timezone_name(self.conn))
+
+    def write_snapshot(
+        self,
+        rows: Iterable[tuple[str, str, int, int | None, str]],
+        failures: Iterable[tuple[str, str, str, str]] = (),
+    ) -> None:
+        succeeded: dict[tuple[str, str], None] = {}
+
+        def tracked():
+            for row in rows:
+                succeeded[(row[0], row[1])] = None
+                yield row
+
+        with self.conn:
+            insert_travel_times(self.conn, tracked(), commit=False, tz=self.tz)
+            record_element_status(self.conn, succeeded, failures)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "TravelTimeWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,277 @@
+import math
+import sqlite3
+import statistics
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from maps_scraper import db
+
+HOURS_OF_WEEK = 7 * 24
+
+# Live rows kept per pair, counted back from the pair's newest observation.
+SERIES_LOOKBACK_SECONDS = 2 * 86400
+# Observations this close before "now" describe current conditions.
+LIVE_WINDOW_SECONDS = 2 * 3600
+# How quickly a live deviation from the profile fades with its age.
+LIVE_DECAY_SECONDS = 2 * 3600
+
+DEFAULT_HORIZON_HOURS = 6
+DEFAULT_STEP_MINUTES = 15
+DEFAULT_LIMIT = 5
+# Inclusive bounds shared by the API and the CLI.
+HORIZON_HOURS_RANGE = (1, 24)
+STEP_MINUTES_RANGE = (5, 60)
+LIMIT_RANGE = (1, 100)
+# Keeps now + horizon inside what datetime can represent.
+PLAN_YEAR_RANGE = (1971, 9998)
+
+
+def _empty_profile() -> array:
+    return array("i", bytes(4 * HOURS_OF_WEEK))
+
+
+@dataclass
+class PairSeries:
+    """Recent observations and the hour-of-week profile for one trip.
+
+    Once a series is handed out by ``DepartureIndex`` it is never mutated;
+    a refresh builds a replacement, so readers need no lock.
+    """
+
+    epochs: array = field(default_factory=lambda: array("q"))
+    durations: array = field(default_factory=lambda: array("i"))
+    slots: array = field(default_factory=lambda: array("B"))
+    p50: array = field(default_factory=_empty_profile)
+    p90: array = field(default_factory=_empty_profile)
+    counts: array = field(default_factory=_empty_profile)
+    revision: int = -1
+
+    def append(self, rows: list[tuple[int, int, int, int]]) -> None:
+        for epoch, duration, weekday, hour in rows:
+            self.epochs.append(epoch)
+            self.durations.append(duration)
+            self.slots.append(weekday * 24 + hour)
+        if self.epochs:
+            cut = bisect_left(self.epochs, self.epochs[-1] - SERIES_LOOKBACK_SECONDS)
+            del self.epochs[:cut], self.durations[:cut], self.slots[:cut]
+
+    def set_profile(self, rows: list[tuple[int, int, int, int, int]]) -> None:
+        self.p50, self.p90, self.counts = (
+            _empty_profile(),
+            _empty_profile(),
+            _empty_profile(),
+        )
+        for weekday, hour, count, p50, p90 in rows:
+            slot = weekday * 24 + hour
+            self.counts[slot], self.p50[slot], self.p90[slot] = count, p50, p90
+
+    def live_ratio(self, now: int) -> tuple[float, int | None]:
+        """Median observed/typical ratio over the live window ending at ``now``."""
+        start = bisect_left(self.epochs, now - LIVE_WINDOW_SECONDS)
+        end = bisect_right(self.epochs, now)
+        ratios = [
+            self.durations[index] / self.p50[self.slots[index]]
+            for index in range(start, end)
+            if self.p50[self.slots[index]]
+        ]
+        if not ratios:
+            return 1.0, None
+        return statistics.median(ratios), self.epochs[end - 1]
+
+    def expected(self, hour_of_week: float) -> tuple[float, float, int] | None:
+        # Buckets describe departures within the hour; interpolate between
+        # bucket midpoints so neighbouring departure times rank smoothly.
+        position = hour_of_week - 0.5
+        lower = math.floor(position)
+        fraction = position - lower
+        slots = (lower % HOURS_OF_WEEK, (lower + 1) % HOURS_OF_WEEK)
+        present = [slot for slot in slots if self.counts[slot]]
+        if not present:
+            return None
+        if len(present) == 1:
+            slot = present[0]
+            return float(self.p50[slot]), float(self.p90[slot]), self.counts[slot]
+        weights = (1 - fraction, fraction)
+        nearest = slots[0] if fraction < 0.5 else slots[1]
+        return (
+            sum(weight * self.p50[slot] for weight, slot in zip(weights, slots)),
+            sum(weight * self.p90[slot] for weight, slot in zip(weights, slots)),
+            self.counts[nearest],
+        )
+
+
+class DepartureIndex:
+    """Per-pair series held in memory and topped up when the data revision moves."""
+
+    def __init__(self) -> None:
+        self._pairs: dict[tuple[str, str], PairSeries] = {}
+        self._lock = threading.Lock()
+
+    def series(
+        self, conn: sqlite3.Connection, origin: str, destination: str
+    ) -> PairSeries:
+        revision = db.data_revision(conn)
+        with self._lock:
+            series = self._pairs.get((origin, destination))
+            if series is None:
+                # Only trips with a profile are cached, so arbitrary query
+                # strings cannot grow the index.
+                if not _has_profile(conn, origin, destination):
+                    return PairSeries()
+                series = PairSeries()
+            if series.revision != revision:
+                series = _refresh_series(conn, series, origin, destination)
+                series.revision = revision
+                self._pairs[(origin, destination)] = series
+            return series
+
+
+def _has_profile(conn: sqlite3.Connection, origin: str, destination: str) -> bool:
+    return (
+        conn.execute(
+            "SELECT 1 FROM hour_profile WHERE origin = ? AND destination = ? LIMIT 1",
+            (origin, destination),
+        ).fetchone()
+        is not None
+    )
+
+
+def _refresh_series(
+    conn: sqlite3.Connection, previous: PairSeries, origin: str, destination: str
+) -> PairSeries:
+    """Build a copy of ``previous`` topped up with newer rows and the current profile."""
+    series = PairSeries(
+        array("q", previous.epochs), array("i", previous.durations), array("B", previous.slots)
+    )
+    ids = dict(
+        conn.execute(
+            "SELECT name, id FROM locations WHERE name IN (?, ?)", (origin, destination)
+        ).fetchall()
+    )
+    if origin in ids and destination in ids:
+        pair = (ids[origin], ids[destination])
+        if series.epochs:
+            since = series.epochs[-1] + 1
+        else:
+            newest = conn.execute(
+                """
+                SELECT MAX(observed_epoch)
+                FROM observations
+                WHERE origin_id = ? AND destination_id = ?
+                """,
+                pair,
+            ).fetchone()[0]
+            since = (newest or 0) - SERIES_LOOKBACK_SECONDS
+        series.append(
+            conn.execute(
+                """
+                SELECT observed_epoch, duration_seconds, local_weekday, local_hour
+                FROM observations
+                WHERE origin_id = ? AND destination_id = ? AND observed_epoch >= ?
+                ORDER BY observed_epoch
+                """,
+                pair + (since,),
+            ).fetchall()
+        )
+    series.set_profile(
+        conn.execute(
+            """
+            SELECT local_weekday, local_hour, sample_count, p50_duration, p90_duration
+            FROM hour_profile
+            WHERE origin = ? AND destination = ?
+            """,
+            (origin, destination),
+        ).fetchall()
+    )
+    return series
+
+
+def parse_departure_time(value: str, tz: ZoneInfo) -> int:
+    # Unlike observed_at, a naive time here means local wall-clock time.
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=tz)
+    low, high = PLAN_YEAR_RANGE
+    if not low <= moment.year <= high:
+        raise ValueError(f"departure time must fall between {low} and {high}")
+    return int(moment.timestamp())
+
+
+def _local_iso(epoch: int, tz: ZoneInfo) -> str:
+    offset = int(datetime.fromtimestamp(epoch, tz).utcoffset().total_seconds()) // 60
+    return db.local_iso(epoch, offset)
+
+
+def rank_departures(
+    series: PairSeries,
+    tz: ZoneInfo,
+    now: int,
+    horizon_hours: int = DEFAULT_HORIZON_HOURS,
+    step_minutes: int = DEFAULT_STEP_MINUTES,
+    limit: int = DEFAULT_LIMIT,
+) -> dict:
+    ratio, live_epoch = series.live_ratio(now)
+    step = step_minutes * 60
+    windows = []
+    leave_now = None
+    for depart in range(now, now + horizon_hours * 3600 + 1, step):
+        local = datetime.fromtimestamp(depart, tz)
+        expected = series.expected(
+            local.weekday() * 24 + local.hour + local.minute / 60 + local.second / 3600
+        )
+        if expected is None:
+            continue
+        p50, p90, count = expected
+        weight = 0.0
+        if live_epoch is not None:
+            weight = math.exp(-(depart - live_epoch) / LIVE_DECAY_SECONDS)
+        scale = 1 + (ratio - 1) * weight
+        window = {
+            "depart_at": _local_iso(depart, tz),
+            "depart_until": _local_iso(depart + step, tz),
+            "expected_seconds": round(p50 * scale),
+            "p90_seconds": round(p90 * scale),
+            "samples": count,
+        }
+        if depart == now:
+            leave_now = window["expected_seconds"]
+        windows.append(window)
+
+    # sorted() is stable, so ties keep the earlier departure first.
+    ranked = sorted(windows, key=lambda window: window["expected_seconds"])[:limit]
+    for rank, window in enumerate(ranked, start=1):
+        window["rank"] = rank
+        window["saves_seconds"] = (
+            leave_now - window["expected_seconds"] if leave_now is not None else None
+        )
+    return {
+        "live_ratio": round(ratio, 3),
+        "live_observed_at": None if live_epoch is None else _local_iso(live_epoch, tz),
+        "leave_now_seconds": leave_now,
+        "windows": ranked,
+    }
+
+
+def best_departure(
+    conn: sqlite3.Connection,
+    origin: str,
+    destination: str,
+    now: int,
+    horizon_hours: int = DEFAULT_HORIZON_HOURS,
+    step_minutes: int = DEFAULT_STEP_MINUTES,
+    limit: int = DEFAULT_LIMIT,
+    index: DepartureIndex | None = None,
+) -> dict:
+    index = index or DepartureIndex()
+    return rank_departures(
+        index.series(conn, origin, destination),
+        db.load_timezone(db.get_timezone_name(conn)),
+        now,
+        horizon_hours,
+        step_minutes,
+        limit,
+    )
@@ -0,0 +1,591 @@
+import calendar
+import gzip
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import groupby
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from maps_scraper import archive, db, serialize
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIRECTIONS = (
+    {"id": "westbound", "label": "Westbound"},
+    {"id": "eastbound", "label": "Eastbound"},
+)
+
+# Spawning workers costs most of a second. Incremental exports that touch
+# fewer target-days than this finish sooner in-process.
+PARALLEL_MIN_CHANGED_DAYS = 400
+
+SERIES_MAGIC = b"MDT1"
+SERIES_VERSION = 1
+SERIES_HEADER = struct.Struct("<4sHHII")
+
+# (local_date, observed_epoch, utc_offset_minutes, duration_seconds)
+DayRow = tuple[str, int, int, int]
+
+
+@dataclass(frozen=True)
+class ExportTarget:
+    origin: str
+    origin_id: str
+    direction: str
+    destination: str
+    destination_id: str
+
+    @property
+    def trip(self) -> tuple[str, str]:
+        if self.direction == "eastbound":
+            return self.destination, self.origin
+        return self.origin, self.destination
+
+    @property
+    def day_dir(self) -> str:
+        return f"day/{self.origin_id}/{self.direction}/{self.destination_id}"
+
+    @property
+    def calendar_dir(self) -> str:
+        return f"calendar/{self.origin_id}/{self.direction}/{self.destination_id}"
+
+    @property
+    def profile_path(self) -> str:
+        return f"profile/{self.origin_id}/{self.direction}/{self.destination_id}.json"
+
+
+def encode_json(payload: dict | list) -> bytes:
+    return serialize.dumps(payload)
+
+
+def encode_day_series(series: list[tuple[int, int, int]]) -> bytes:
+    minutes = [epoch // 60 for epoch, _, _ in series]
+    base_minute = minutes[0] if minutes else 0
+    deltas = [current - previous for previous, current in zip([base_minute] + minutes, minutes)]
+    if any(delta < 0 or delta > 0xFFFF for delta in deltas):
+        raise ValueError("Observation gap does not fit a uint16 minute delta")
+    durations = [min(duration, 0xFFFF) for _, duration, _ in series]
+    offsets = [offset for _, _, offset in series]
+    count = len(series)
+    return b"".join(
+        (
+            SERIES_HEADER.pack(SERIES_MAGIC, SERIES_VERSION, 0, count, base_minute),
+            struct.pack(f"<{count}H", *deltas),
+            struct.pack(f"<{count}H", *durations),
+            struct.pack(f"<{count}h", *offsets),
+        )
+    )
+
+
+def month_days(month: str) -> list[str]:
+    year, month_number = (int(part) for part in month.split("-"))
+    day_count = calendar.monthrange(year, month_number)[1]
+    return [f"{month}-{day:02d}" for day in range(1, day_count + 1)]
+
+
+def precompressed_encodings() -> dict[str, str]:
+    encodings = {"gzip": ".gz"}
+    if brotli is not None:
+        encodings["br"] = ".br"
+    return encodings
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(content, quality=11)
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def atomic_write(path: Path, content: bytes) -> None:
+    # Readers and concurrent workers never see a half-written file.
+    temp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temp.write_bytes(content)
+    os.replace(temp, path)
+
+
+class SiteWriter:
+    def __init__(
+        self, out_dir: Path, hashes: dict[str, str], precompress: bool = False
+    ) -> None:
+        self.out_dir = out_dir
+        self.hashes = dict(hashes)
+        self.encodings = precompressed_encodings() if precompress else {}
+
+    def _siblings(self, path: Path) -> list[tuple[str, Path]]:
+        return [
+            (encoding, path.with_name(path.name + suffix))
+            for encoding, suffix in self.encodings.items()
+        ]
+
+    def write(self, path: Path, content: bytes) -> bool:
+        relative = path.relative_to(self.out_dir).as_posix()
+        digest = hashlib.sha256(content).hexdigest()
+        unchanged = self.hashes.get(relative) == digest and path.exists()
+        missing = [
+            (encoding, sibling)
+            for encoding, sibling in self._siblings(path)
+            if not unchanged or not sibling.exists()
+        ]
+        if unchanged and not missing:
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not unchanged:
+            atomic_write(path, content)
+            self.hashes[relative] = digest
+        for encoding, sibling in missing:
+            atomic_write(sibling, compress(content, encoding))
+        return not unchanged
+
+    def remove(self, relative: str) -> None:
+        path = self.out_dir / relative
+        for candidate in [path] + [
+            path.with_name(path.name + suffix) for suffix in (".gz", ".br")
+        ]:
+            candidate.unlink(missing_ok=True)
+        self.hashes.pop(relative, None)
+
+    def write_json(self, path: Path, payload: dict | list) -> bool:
+        return self.write(path, encode_json(payload))
+
+
+def export_targets(
+    origin_entries: list[dict], destinations: list[dict]
+) -> list[ExportTarget]:
+    labels = {dest["id"]: dest["label"] for dest in destinations}
+    return [
+        ExportTarget(
+            origin_entry["label"],
+            origin_entry["id"],
+            direction["id"],
+            labels[dest_id],
+            dest_id,
+        )
+        for origin_entry in origin_entries
+        for direction in DIRECTIONS
+        for dest_id in sorted(origin_entry["destinations"])
+    ]
+
+
+def observation_schemas(conn: sqlite3.Connection) -> list[str]:
+    return [
+        row[1]
+        for row in conn.execute("PRAGMA database_list").fetchall()
+        if row[1] != "temp"
+        and conn.execute(
+            f"SELECT 1 FROM {row[1]}.sqlite_master WHERE type = 'table' AND name = 'observations'"
+        ).fetchone()
+    ]
+
+
+def _observations_sql(schemas: list[str], where: str = "") -> str:
+    # Hot and archived observations share location ids, so a merged scan in
+    # (origin_id, destination_id, observed_epoch) order needs no sort.
+    return (
+        " UNION ALL ".join(
+            f"""
+            SELECT origin_id, destination_id, local_date, observed_epoch,
+                   utc_offset_minutes, duration_seconds
+            FROM {schema}.observations
+            {where}
+            """
+            for schema in schemas
+        )
+        + " ORDER BY origin_id, destination_id, observed_epoch"
+    )
+
+
+def stream_pairs(
+    conn: sqlite3.Connection,
+) -> Iterator[tuple[tuple[str, str], Iterator[DayRow]]]:
+    """Yield every pair's rows in one pass, in primary-key (time) order."""
+    names = dict(conn.execute("SELECT id, name FROM main.locations").fetchall())
+    rows = conn.execute(_observations_sql(observation_schemas(conn)))
+    for (origin_id, destination_id), pair_rows in groupby(
+        rows, key=lambda row: (row[0], row[1])
+    ):
+        yield (names[origin_id], names[destination_id]), (
+            (row[2], row[3], row[4], row[5]) for row in pair_rows
+        )
+
+
+def trip_rows(conn: sqlite3.Connection, trip: tuple[str, str]) -> Iterator[DayRow]:
+    ids = dict(
+        conn.execute(
+            "SELECT name, id FROM main.locations WHERE name IN (?, ?)", trip
+        ).fetchall()
+    )
+    if trip[0] not in ids or trip[1] not in ids:
+        return
+    schemas = observation_schemas(conn)
+    sql = _observations_sql(schemas, "WHERE origin_id = ? AND destination_id = ?")
+    for row in conn.execute(sql, (ids[trip[0]], ids[trip[1]]) * len(schemas)):
+        yield row[2], row[3], row[4], row[5]
+
+
+def pair_day_rows(
+    conn: sqlite3.Connection, origin: str, destination: str, days: list[str]
+) -> list[DayRow]:
+    if not days:
+        return []
+    return [
+        tuple(row)
+        for row in conn.execute(
+            f"""
+            SELECT local_date, observed_epoch, utc_offset_minutes, duration_seconds
+            FROM travel_times
+            WHERE origin = ?
+              AND destination = ?
+              AND local_date IN ({', '.join('?' for _ in days)})
+            ORDER BY local_date, observed_epoch
+            """,
+            [origin, destination, *days],
+        )
+    ]
+
+
+def day_payload(target: ExportTarget, day: str, rows: Iterable[DayRow]) -> dict:
+    return {
+        "origin": target.origin,
+        "destination": target.destination,
+        "date": day,
+        "direction": target.direction,
+        "data": [
+            {
+                "observed_at": db.local_iso(epoch, offset),
+                "duration_seconds": duration,
+            }
+            for _, epoch, offset, duration in rows
+        ],
+    }
+
+
+def day_files(
+    target: ExportTarget,
+    rows: Iterable[DayRow],
+    day_layout: str = "daily",
+    data_format: str = "json",
+) -> Iterator[tuple[str, bytes]]:
+    """Encode one target's rows into day files, one day or month at a time."""
+    if day_layout == "monthly":
+        for month, month_rows in groupby(rows, key=lambda row: row[0][:7]):
+            if data_format == "binary":
+                yield f"{target.day_dir}/{month}.bin", encode_day_series(
+                    [(epoch, duration, offset) for _, epoch, offset, duration in month_rows]
+                )
+                continue
+            days = {
+                day: [
+                    {
+                        "observed_at": db.local_iso(epoch, offset),
+                        "duration_seconds": duration,
+                    }
+                    for _, epoch, offset, duration in day_rows
+                ]
+                for day, day_rows in groupby(month_rows, key=lambda row: row[0])
+            }
+            yield f"{target.day_dir}/{month}.json", encode_json(
+                {
+                    "origin": target.origin,
+                    "destination": target.destination,
+                    "month": month,
+                    "direction": target.direction,
+                    "days": days,
+                }
+            )
+        return
+    for day, day_rows in groupby(rows, key=lambda row: row[0]):
+        if data_format == "binary":
+            yield f"{target.day_dir}/{day}.bin", encode_day_series(
+                [(epoch, duration, offset) for _, epoch, offset, duration in day_rows]
+            )
+            continue
+        yield f"{target.day_dir}/{day}.json", encode_json(
+            day_payload(target, day, day_rows)
+        )
+
+
+def calendar_files(
+    target: ExportTarget, days: Iterable[tuple[str, int]], years: Iterable[int]
+) -> Iterator[tuple[str, bytes]]:
+    by_year: dict[int, dict[str, int]] = {}
+    for day, max_duration in days:
+        by_year.setdefault(int(day[:4]), {})[day] = max_duration
+    for year in years:
+        yield f"{target.calendar_dir}/{year}.json", encode_json(
+            {
+                "origin": target.origin,
+                "destination": target.destination,
+                "year": year,
+                "direction": target.direction,
+                "data": by_year.get(year, {}),
+            }
+        )
+
+
+def profile_file(target: ExportTarget, entries: list[dict]) -> tuple[str, bytes]:
+    return target.profile_path, encode_json(
+        {
+            "origin": target.origin,
+            "destination": target.destination,
+            "direction": target.direction,
+            "data": entries,
+        }
+    )
+
+
+def stream_profiles(
+    conn: sqlite3.Connection,
+) -> Iterator[tuple[tuple[str, str], list[dict]]]:
+    rows = conn.execute(
+        """
+        SELECT origin, destination, local_weekday, local_hour, sample_count,
+               mean_duration, p50_duration, p90_duration, max_duration
+        FROM hour_profile
+        ORDER BY origin, destination, local_weekday, local_hour
+        """
+    )
+    for pair, pair_rows in groupby(rows, key=lambda row: (row[0], row[1])):
+        yield pair, [db.profile_entry(row[2:]) for row in pair_rows]
+
+
+def trip_calendar(conn: sqlite3.Connection, trip: tuple[str, str]) -> list[tuple[str, int]]:
+    return [
+        tuple(row)
+        for row in conn.execute(
+            """
+            SELECT local_date, max_duration
+            FROM daily_summary
+            WHERE origin = ? AND destination = ?
+            ORDER BY local_date
+            """,
+            trip,
+        )
+    ]
+
+
+def stream_calendars(
+    conn: sqlite3.Connection,
+) -> Iterator[tuple[tuple[str, str], Iterator[tuple[str, int]]]]:
+    rows = conn.execute(
+        """
+        SELECT origin, destination, local_date, max_duration
+        FROM daily_summary
+        ORDER BY origin, destination, local_date
+        """
+    )
+    for pair, pair_rows in groupby(rows, key=lambda row: (row[0], row[1])):
+        yield pair, ((row[2], row[3]) for row in pair_rows)
+
+
+def export_all(
+    conn: sqlite3.Connection,
+    targets: list[ExportTarget],
+    years: list[int],
+    day_layout: str = "daily",
+    data_format: str = "json",
+) -> Iterator[tuple[str, bytes]]:
+    """Yield every calendar and day file from one pass over each table.
+
+    Files are produced pair by pair, so only one month of one pair's rows is
+    held in memory at a time.
+    """
+    by_trip: dict[tuple[str, str], list[ExportTarget]] = {}
+    for target in targets:
+        by_trip.setdefault(target.trip, []).append(target)
+
+    pending = set(targets)
+    for trip, days in stream_calendars(conn):
+        trip_targets = by_trip.get(trip, [])
+        if len(trip_targets) > 1:
+            days = list(days)
+        for target in trip_targets:
+            pending.discard(target)
+            yield from calendar_files(target, days, years)
+    for target in targets:
+        if target in pending:
+            yield from calendar_files(target, (), years)
+
+    pending = set(targets)
+    for trip, entries in stream_profiles(conn):
+        for target in by_trip.get(trip, []):
+            pending.discard(target)
+            yield profile_file(target, entries)
+    for target in targets:
+        if target in pending:
+            yield profile_file(target, [])
+
+    for trip, rows in stream_pairs(conn):
+        trip_targets = by_trip.get(trip, [])
+        if len(trip_targets) > 1:
+            rows = list(rows)
+        for target in trip_targets:
+            yield from day_files(target, rows, day_layout, data_format)
+
+
+def trip_files(
+    conn: sqlite3.Connection,
+    trip: tuple[str, str],
+    targets: list[ExportTarget],
+    years: list[int],
+    day_layout: str = "daily",
+    data_format: str = "json",
+) -> Iterator[tuple[str, bytes]]:
+    days = trip_calendar(conn, trip)
+    entries = db.hour_profile(conn, *trip)
+    for target in targets:
+        yield from calendar_files(target, days, years)
+        yield profile_file(target, entries)
+    rows = list(trip_rows(conn, trip)) if len(targets) > 1 else trip_rows(conn, trip)
+    for target in targets:
+        yield from day_files(target, rows, day_layout, data_format)
+
+
+def changed_files(
+    conn: sqlite3.Connection,
+    target: ExportTarget,
+    changed_days: list[str],
+    day_layout: str = "daily",
+    data_format: str = "json",
+) -> Iterator[tuple[str, bytes]]:
+    by_year: dict[int, list[str]] = {}
+    for day in changed_days:
+        by_year.setdefault(int(day[:4]), []).append(day)
+    for year in sorted(by_year):
+        days = conn.execute(
+            """
+            SELECT local_date, max_duration
+            FROM daily_summary
+            WHERE origin = ? AND destination = ?
+              AND local_date >= ? AND local_date < ?
+            ORDER BY local_date
+            """,
+            (*target.trip, f"{year:04d}-01-01", f"{year + 1:04d}-01-01"),
+        ).fetchall()
+        yield from calendar_files(target, days, [year])
+    if changed_days:
+        yield profile_file(target, db.hour_profile(conn, *target.trip))
+    if day_layout == "monthly":
+        changed_days = [
+            day
+            for month in sorted({day[:7] for day in changed_days})
+            for day in month_days(month)
+        ]
+    yield from day_files(
+        target, pair_day_rows(conn, *target.trip, changed_days), day_layout, data_format
+    )
+
+
+def export_tasks(
+    targets: list[ExportTarget],
+    changed: dict[tuple[str, str, str], set[str]] | None,
+) -> list[tuple]:
+    """Split an export into independent units: one trip, or one changed target."""
+    if changed is not None:
+        return [
+            (
+                "changed",
+                target,
+                sorted(changed.get((target.origin, target.direction, target.destination), ())),
+            )
+            for target in targets
+            if changed.get((target.origin, target.direction, target.destination))
+        ]
+    by_trip: dict[tuple[str, str], list[ExportTarget]] = {}
+    for target in targets:
+        by_trip.setdefault(target.trip, []).append(target)
+    return [("trip", trip, trip_targets) for trip, trip_targets in by_trip.items()]
+
+
+def parallel_worthwhile(tasks: list[tuple], jobs: int) -> bool:
+    """Whether the tasks justify the fixed cost of starting a spawn pool."""
+    if jobs < 2 or len(tasks) < 2:
+        return False
+    if any(kind == "trip" for kind, _, _ in tasks):
+        return True
+    changed_days = sum(len(days) for _, _, days in tasks)
+    return changed_days >= PARALLEL_MIN_CHANGED_DAYS
+
+
+def task_files(
+    conn: sqlite3.Connection,
+    task: tuple,
+    years: list[int],
+    day_layout: str,
+    data_format: str,
+) -> Iterator[tuple[str, bytes]]:
+    kind, key, detail = task
+    if kind == "changed":
+        return changed_files(conn, key, detail, day_layout, data_format)
+    return trip_files(conn, key, detail, years, day_layout, data_format)
+
+
+_worker: dict = {}
+
+
+def _init_worker(
+    db_path: str,
+    archive_dir: Path | None,
+    out_dir: Path,
+    hashes: dict[str, str],
+    precompress: bool,
+    years: list[int],
+    day_layout: str,
+    data_format: str,
+) -> None:
+    conn = db.connect_readonly(db_path)
+    archive.attach_archives(conn, archive_dir)
+    _worker.update(
+        conn=conn,
+        writer=SiteWriter(out_dir, hashes, precompress),
+        options=(years, day_layout, data_format),
+    )
+
+
+def _run_task(task: tuple) -> dict[str, str]:
+    writer = _worker["writer"]
+    data_root = writer.out_dir / "data"
+    written: dict[str, str] = {}
+    for relative, content in task_files(_worker["conn"], task, *_worker["options"]):
+        writer.write(data_root / relative, content)
+        key = f"data/{relative}"
+        written[key] = writer.hashes[key]
+    return written
+
+
+def export_parallel(
+    db_path: str,
+    archive_dir: Path | None,
+    out_dir: Path,
+    hashes: dict[str, str],
+    precompress: bool,
+    tasks: list[tuple],
+    years: list[int],
+    day_layout: str,
+    data_format: str,
+    jobs: int,
+) -> dict[str, str]:
+    """Run export tasks on a process pool and return the hashes they wrote.
+
+    Every worker opens its own read-only connection. Files are written with
+    atomic renames, and each task owns a disjoint set of paths.
+    """
+    written: dict[str, str] = {}
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(
+            db_path, archive_dir, out_dir, hashes, precompress, years, day_layout, data_format
+        ),
+    ) as pool:
+        for result in pool.map(_run_task, tasks, chunksize=max(1, len(tasks) // (jobs * 4))):
+            written.update(result)
+    return written
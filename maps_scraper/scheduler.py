@@ -0,0 +1,107 @@
+import logging
+import math
+import random
+import time
+from typing import Callable, Iterator, TypeVar
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+MISSED_SLOT_POLICIES = ("skip", "catch_up")
+RETRYABLE_ERRORS = (requests.RequestException, RuntimeError)
+
+T = TypeVar("T")
+
+
+class SlotScheduler:
+    def __init__(
+        self,
+        interval_seconds: float,
+        jitter_seconds: float = 0.0,
+        missed_slots: str = "skip",
+        clock=time.time,
+        sleep=time.sleep,
+        rng: random.Random | None = None,
+    ) -> None:
+        if interval_seconds <= 0:
+            raise ValueError("interval_seconds must be positive")
+        if not 0 <= jitter_seconds < interval_seconds:
+            raise ValueError("jitter_seconds must be in [0, interval_seconds)")
+        if missed_slots not in MISSED_SLOT_POLICIES:
+            raise ValueError(
+                f"missed_slots must be one of {', '.join(MISSED_SLOT_POLICIES)}"
+            )
+        self.interval_seconds = interval_seconds
+        self.jitter_seconds = jitter_seconds
+        self.missed_slots = missed_slots
+        self.clock = clock
+        self.sleep = sleep
+        self._rng = rng or random.Random()
+
+    def slot_start(self, now: float) -> float:
+        return math.floor(now / self.interval_seconds) * self.interval_seconds
+
+    def slots(self) -> Iterator[tuple[float, float]]:
+        slot = self.slot_start(self.clock())
+        while True:
+            run_at = slot + self._rng.uniform(0, self.jitter_seconds)
+            now = self.clock()
+            if run_at > now:
+                self.sleep(run_at - now)
+            yield slot, slot + self.interval_seconds
+
+            slot += self.interval_seconds
+            current = self.slot_start(self.clock())
+            if current > slot:
+                missed = int((current - slot) // self.interval_seconds)
+                logger.warning("missed %d scrape slot(s)", missed)
+                # Catching up runs one sample immediately; samples are stamped
+                # when taken, so replaying every missed slot adds nothing.
+                slot = current
+                if self.missed_slots == "skip":
+                    slot += self.interval_seconds
+
+
+def call_with_backoff(
+    func: Callable[[], T],
+    deadline: float,
+    base_delay_seconds: float = 1.0,
+    max_delay_seconds: float = 60.0,
+    clock=time.time,
+    sleep=time.sleep,
+) -> T:
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except RETRYABLE_ERRORS as exc:
+            delay = min(max_delay_seconds, base_delay_seconds * 2**attempt)
+            if clock() + delay >= deadline:
+                raise
+            logger.warning("scrape attempt %d failed (%s); retrying", attempt + 1, exc)
+            sleep(delay)
+            attempt += 1
+
+
+def run_scheduled(
+    make_attempt: Callable[[], Callable[[], object]],
+    scheduler: SlotScheduler,
+    base_delay_seconds: float = 1.0,
+    max_delay_seconds: float = 60.0,
+    max_slots: int | None = None,
+) -> None:
+    for index, (_, deadline) in enumerate(scheduler.slots()):
+        try:
+            call_with_backoff(
+                make_attempt(),
+                deadline,
+                base_delay_seconds,
+                max_delay_seconds,
+                clock=scheduler.clock,
+                sleep=scheduler.sleep,
+            )
+        except Exception:
+            logger.exception("scrape slot failed; waiting for the next slot")
+        if max_slots is not None and index + 1 >= max_slots:
+            return
@@ -1,11 +1,16 @@
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Iterable
+from itertools import chain
+from typing import Callable, Iterable
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from maps_scraper import db
+from maps_scraper.scheduler import SlotScheduler, run_scheduled
 
 
 @dataclass(frozen=True)
@@ -15,21 +20,65 @@ class TravelTime:
     distance_meters: int | None
 
 
-def fetch_travel_times(
-    api_key: str,
-    origin: str,
-    destinations: Iterable[str],
-    timeout_seconds: int = 15,
-) -> list[TravelTime]:
-    destination_list = list(destinations)
-    if not destination_list:
+@dataclass(frozen=True)
+class ElementFailure:
+    origin: str
+    destination: str
+    status: str
+
+    @property
+    def retryable(self) -> bool:
+        return self.status not in FINAL_ELEMENT_STATUSES
+
+
+class PartialScrapeError(RuntimeError):
+    def __init__(self, failures: list[ElementFailure]) -> None:
+        super().__init__(f"{len(failures)} element(s) failed")
+        self.failures = failures
+
+
+DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+MAX_ORIGINS_PER_REQUEST = 25
+MAX_DESTINATIONS_PER_REQUEST = 25
+MAX_ELEMENTS_PER_REQUEST = 100
+# Element statuses that won't change on an immediate retry; they are recorded
+# and picked up again by the next scheduled snapshot.
+FINAL_ELEMENT_STATUSES = frozenset(
+    {"NOT_FOUND", "ZERO_RESULTS", "MAX_ROUTE_LENGTH_EXCEEDED", "MAX_WAYPOINTS_EXCEEDED"}
+)
+
+
+def plan_matrix_chunks(
+    origins: list[str], destinations: list[str]
+) -> list[tuple[list[str], list[str]]]:
+    if not origins or not destinations:
         return []
+    destination_step = min(
+        MAX_DESTINATIONS_PER_REQUEST, MAX_ELEMENTS_PER_REQUEST, len(destinations)
+    )
+    origin_step = max(
+        1, min(MAX_ORIGINS_PER_REQUEST, MAX_ELEMENTS_PER_REQUEST // destination_step)
+    )
+    return [
+        (origins[i : i + origin_step], destinations[j : j + destination_step])
+        for i in range(0, len(origins), origin_step)
+        for j in range(0, len(destinations), destination_step)
+    ]
+
 
-    response = requests.get(
-        "https://maps.googleapis.com/maps/api/distancematrix/json",
+def request_matrix(
+    api_key: str,
+    origins: list[str],
+    destinations: list[str],
+    timeout_seconds: int = 15,
+    session: requests.Session | None = None,
+    url: str = DISTANCE_MATRIX_URL,
+) -> list[list[dict]]:
+    response = (session or requests).get(
+        url,
         params={
-            "origins": origin,
-            "destinations": "|".join(destination_list),
+            "origins": "|".join(origins),
+            "destinations": "|".join(destinations),
             "mode": "driving",
             "departure_time": "now",
             "key": api_key,
@@ -45,87 +94,462 @@ def fetch_travel_times(
     rows = payload.get("rows", [])
     if not rows:
         raise RuntimeError("API response missing rows")
+    if len(rows) != len(origins):
+        raise RuntimeError("API response origin count mismatch")
 
-    elements = rows[0].get("elements", [])
-    if len(elements) != len(destination_list):
-        raise RuntimeError("API response destination count mismatch")
+    matrix: list[list[dict]] = []
+    for row in rows:
+        elements = row.get("elements", [])
+        if len(elements) != len(destinations):
+            raise RuntimeError("API response destination count mismatch")
+        matrix.append(elements)
+    return matrix
 
-    results: list[TravelTime] = []
-    for destination, element in zip(destination_list, elements):
-        if element.get("status") != "OK":
-            raise RuntimeError(
-                f"API element error for {destination}: {element.get('status')}"
-            )
-        duration = element.get("duration_in_traffic", {}).get("value")
-        if duration is None:
-            duration = element.get("duration", {}).get("value")
-        distance = element.get("distance", {}).get("value")
-        if duration is None:
-            raise RuntimeError(f"Missing duration for {destination}")
-        results.append(
-            TravelTime(
-                destination=destination,
-                duration_seconds=int(duration),
-                distance_meters=int(distance) if distance is not None else None,
-            )
+
+def parse_element(destination: str, element: dict) -> TravelTime:
+    if element.get("status") != "OK":
+        raise RuntimeError(
+            f"API element error for {destination}: {element.get('status')}"
         )
+    duration = element.get("duration_in_traffic", {}).get("value")
+    if duration is None:
+        duration = element.get("duration", {}).get("value")
+    distance = element.get("distance", {}).get("value")
+    if duration is None:
+        raise RuntimeError(f"Missing duration for {destination}")
+    return TravelTime(
+        destination=destination,
+        duration_seconds=int(duration),
+        distance_meters=int(distance) if distance is not None else None,
+    )
 
+
+def plan_pair_matrices(
+    pairs: Iterable[tuple[str, str]],
+) -> list[tuple[list[str], list[str]]]:
+    by_origin: dict[str, list[str]] = {}
+    by_destination: dict[str, list[str]] = {}
+    for origin, destination in dict.fromkeys(pairs):
+        by_origin.setdefault(origin, []).append(destination)
+        by_destination.setdefault(destination, []).append(origin)
+    if len(by_destination) < len(by_origin):
+        return [(origins, [destination]) for destination, origins in by_destination.items()]
+    return [([origin], destinations) for origin, destinations in by_origin.items()]
+
+
+def _failure_reason(exc: Exception) -> str:
+    # HTTP errors embed the request URL, which carries the API key.
+    if isinstance(exc, requests.RequestException):
+        return type(exc).__name__
+    return str(exc)
+
+
+def parse_matrix(
+    origins: list[str],
+    destinations: list[str],
+    matrix: list[list[dict]],
+    failures: list[ElementFailure] | None = None,
+) -> list[tuple[str, TravelTime]]:
+    results: list[tuple[str, TravelTime]] = []
+    for origin, elements in zip(origins, matrix):
+        for destination, element in zip(destinations, elements):
+            try:
+                results.append((origin, parse_element(destination, element)))
+            except RuntimeError:
+                if failures is None:
+                    raise
+                status = element.get("status", "MISSING_STATUS")
+                failures.append(
+                    ElementFailure(
+                        origin,
+                        destination,
+                        "MISSING_DURATION" if status == "OK" else status,
+                    )
+                )
     return results
 
 
-def scrape_once(
+def fetch_travel_times(
     api_key: str,
-    db_path: str,
     origin: str,
     destinations: Iterable[str],
-    observed_at: datetime | None = None,
+    timeout_seconds: int = 15,
 ) -> list[TravelTime]:
     destination_list = list(destinations)
-    travel_times = fetch_travel_times(api_key, origin, destination_list)
-    timestamp = (observed_at or datetime.now(timezone.utc)).isoformat()
-    reverse_times: list[TravelTime] = []
-    reverse_rows: list[tuple[str, str, int, int | None, str]] = []
-    for destination in destination_list:
-        reverse_entries = fetch_travel_times(api_key, destination, [origin])
-        if not reverse_entries:
+    if not destination_list:
+        return []
+
+    return [
+        travel_time
+        for _, travel_time in fetch_travel_matrix(
+            api_key, [origin], destination_list, timeout_seconds
+        )
+    ]
+
+
+def fetch_travel_matrix(
+    api_key: str,
+    origins: Iterable[str],
+    destinations: Iterable[str],
+    timeout_seconds: int = 15,
+    failures: list[ElementFailure] | None = None,
+) -> list[tuple[str, TravelTime]]:
+    origin_list = list(origins)
+    destination_list = list(destinations)
+
+    results: list[tuple[str, TravelTime]] = []
+    for origin_chunk, destination_chunk in plan_matrix_chunks(
+        origin_list, destination_list
+    ):
+        try:
+            matrix = request_matrix(
+                api_key, origin_chunk, destination_chunk, timeout_seconds
+            )
+        except (requests.RequestException, RuntimeError) as exc:
+            if failures is None:
+                raise
+            failures.extend(
+                ElementFailure(origin, destination, _failure_reason(exc))
+                for origin in origin_chunk
+                for destination in destination_chunk
+            )
             continue
-        reverse_entry = reverse_entries[0]
-        reverse_times.append(reverse_entry)
-        reverse_rows.append(
-            (
-                destination,
-                reverse_entry.destination,
-                reverse_entry.duration_seconds,
-                reverse_entry.distance_meters,
-                timestamp,
+        results.extend(parse_matrix(origin_chunk, destination_chunk, matrix, failures))
+
+    return results
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        rate_per_second: float,
+        capacity: float | None = None,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ) -> None:
+        if rate_per_second <= 0:
+            raise ValueError("rate_per_second must be positive")
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_second)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated_at) * self.rate_per_second,
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate_per_second
+            self._sleep(wait_seconds)
+
+
+class ConcurrentFetcher:
+    def __init__(
+        self,
+        api_key: str,
+        max_in_flight: int = 8,
+        rate_per_second: float = 10.0,
+        timeout_seconds: int = 15,
+        url: str = DISTANCE_MATRIX_URL,
+    ) -> None:
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.api_key = api_key
+        self.timeout_seconds = timeout_seconds
+        self.url = url
+        self.rate_limiter = TokenBucket(rate_per_second, capacity=max_in_flight)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="maps-fetch"
+        )
+
+    def _fetch_chunk(
+        self, origins: list[str], destinations: list[str], partial: bool
+    ) -> tuple[list[tuple[str, TravelTime]], list[ElementFailure]]:
+        self.rate_limiter.acquire()
+        failures: list[ElementFailure] = []
+        try:
+            matrix = request_matrix(
+                self.api_key,
+                origins,
+                destinations,
+                self.timeout_seconds,
+                session=self.session,
+                url=self.url,
             )
+        except (requests.RequestException, RuntimeError) as exc:
+            if not partial:
+                raise
+            reason = _failure_reason(exc)
+            failures = [
+                ElementFailure(origin, destination, reason)
+                for origin in origins
+                for destination in destinations
+            ]
+            return [], failures
+        entries = parse_matrix(
+            origins, destinations, matrix, failures if partial else None
         )
+        return entries, failures
 
-    conn = db.connect(db_path)
-    try:
-        db.init_db(conn)
-        db.insert_travel_times(
-            conn,
+    def fetch_matrices(
+        self,
+        matrices: Iterable[tuple[Iterable[str], Iterable[str]]],
+        failures: list[ElementFailure] | None = None,
+    ) -> list[list[tuple[str, TravelTime]]]:
+        planned = [
+            plan_matrix_chunks(list(origins), list(destinations))
+            for origins, destinations in matrices
+        ]
+        futures = [
             [
-                (origin, entry.destination, entry.duration_seconds, entry.distance_meters, timestamp)
-                for entry in travel_times
-            ],
+                self._executor.submit(self._fetch_chunk, *chunk, failures is not None)
+                for chunk in chunks
+            ]
+            for chunks in planned
+        ]
+        results = []
+        for chunk_futures in futures:
+            entries: list[tuple[str, TravelTime]] = []
+            for future in chunk_futures:
+                chunk_entries, chunk_failures = future.result()
+                entries.extend(chunk_entries)
+                if failures is not None:
+                    failures.extend(chunk_failures)
+            results.append(entries)
+        return results
+
+    def fetch_matrix(
+        self, origins: Iterable[str], destinations: Iterable[str]
+    ) -> list[tuple[str, TravelTime]]:
+        return self.fetch_matrices([(origins, destinations)])[0]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self) -> "ConcurrentFetcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def snapshot_matrices(
+    origins: list[str], destinations: list[str]
+) -> list[tuple[list[str], list[str]]]:
+    return [(origins, destinations), (destinations, origins)]
+
+
+def snapshot_pairs(
+    origins: Iterable[str], destinations: Iterable[str]
+) -> list[tuple[str, str]]:
+    destination_list = list(destinations)
+    return [
+        pair
+        for origin in origins
+        for destination in destination_list
+        for pair in ((origin, destination), (destination, origin))
+    ]
+
+
+def scrape_matrices(
+    api_key: str,
+    db_path: str,
+    matrices: list[tuple[list[str], list[str]]],
+    observed_at: datetime | None = None,
+    fetcher: ConcurrentFetcher | None = None,
+    timezone_name: str | None = None,
+    writer: db.TravelTimeWriter | None = None,
+) -> tuple[list[tuple[str, TravelTime]], list[ElementFailure]]:
+    failures: list[ElementFailure] = []
+    if fetcher is not None:
+        results = fetcher.fetch_matrices(matrices, failures)
+    else:
+        results = [
+            fetch_travel_matrix(api_key, origins, destinations, failures=failures)
+            for origins, destinations in matrices
+        ]
+    timestamp = (observed_at or datetime.now(timezone.utc)).isoformat()
+    entries = list(chain.from_iterable(results))
+    rows = (
+        (row_origin, entry.destination, entry.duration_seconds, entry.distance_meters, timestamp)
+        for row_origin, entry in entries
+    )
+    failure_rows = [
+        (failure.origin, failure.destination, failure.status, timestamp)
+        for failure in failures
+    ]
+
+    if writer is not None:
+        writer.write_snapshot(rows, failure_rows)
+    else:
+        with db.TravelTimeWriter(db_path, timezone_name) as snapshot_writer:
+            snapshot_writer.write_snapshot(rows, failure_rows)
+
+    return entries, failures
+
+
+def scrape_once(
+    api_key: str,
+    db_path: str,
+    origins: Iterable[str],
+    destinations: Iterable[str],
+    observed_at: datetime | None = None,
+    fetcher: ConcurrentFetcher | None = None,
+    timezone_name: str | None = None,
+    writer: db.TravelTimeWriter | None = None,
+) -> list[TravelTime]:
+    entries, _ = scrape_matrices(
+        api_key,
+        db_path,
+        snapshot_matrices(list(origins), list(destinations)),
+        observed_at=observed_at,
+        fetcher=fetcher,
+        timezone_name=timezone_name,
+        writer=writer,
+    )
+    return [entry for _, entry in entries]
+
+
+def scrape_attempt(
+    api_key: str,
+    db_path: str,
+    matrices: list[tuple[list[str], list[str]]],
+    fetcher: ConcurrentFetcher | None = None,
+    writer: db.TravelTimeWriter | None = None,
+) -> Callable[[], None]:
+    pending = matrices
+
+    def attempt() -> None:
+        nonlocal pending
+        if not pending:
+            return
+        _, failures = scrape_matrices(
+            api_key, db_path, pending, fetcher=fetcher, writer=writer
+        )
+        retry = [failure for failure in failures if failure.retryable]
+        pending = plan_pair_matrices(
+            (failure.origin, failure.destination) for failure in retry
         )
-        if reverse_rows:
-            db.insert_travel_times(conn, reverse_rows)
-    finally:
-        conn.close()
+        if retry:
+            raise PartialScrapeError(retry)
+
+    return attempt
+
+
+class AdaptiveSampler:
+    def __init__(
+        self,
+        pairs: Iterable[tuple[str, str]],
+        budget_per_hour: float,
+        min_interval_seconds: float,
+        max_interval_seconds: float,
+        history_weeks: int = 4,
+        refresh_seconds: float = 3600,
+    ) -> None:
+        if budget_per_hour <= 0:
+            raise ValueError("budget_per_hour must be positive")
+        if not 0 < min_interval_seconds <= max_interval_seconds:
+            raise ValueError("min_interval_seconds must be in (0, max_interval_seconds]")
+        self.pairs = list(dict.fromkeys(pairs))
+        self.budget_per_hour = budget_per_hour
+        self.min_interval_seconds = min_interval_seconds
+        self.max_interval_seconds = max_interval_seconds
+        self.history_weeks = history_weeks
+        self.refresh_seconds = refresh_seconds
+        self.next_due = dict.fromkeys(self.pairs, 0.0)
+        self.volatility: dict[tuple[str, str, int, int], float] = {}
+        self._refreshed_at: float | None = None
+
+    def refresh(self, conn, now: float) -> None:
+        if (
+            self._refreshed_at is not None
+            and now - self._refreshed_at < self.refresh_seconds
+        ):
+            return
+        since = int(now) - self.history_weeks * 7 * 86400
+        self.volatility = db.duration_volatility(conn, since)
+        self._refreshed_at = now
 
-    return travel_times + reverse_times
+    def intervals(self, weekday: int, hour: int) -> dict[tuple[str, str], float]:
+        # Look one hour ahead too so sampling densifies before a peak, not after.
+        next_weekday, next_hour = divmod(weekday * 24 + hour + 1, 24)
+        buckets = ((weekday, hour), (next_weekday % 7, next_hour))
+        observed = {
+            pair: [
+                self.volatility[key]
+                for key in ((*pair, *bucket) for bucket in buckets)
+                if key in self.volatility
+            ]
+            for pair in self.pairs
+        }
+        # Pairs without history are sampled like the most volatile known pair.
+        fallback = max((max(v) for v in observed.values() if v), default=1.0)
+        weights = {
+            pair: max(max(values) if values else fallback, 1.0)
+            for pair, values in observed.items()
+        }
+        total = sum(weights.values())
+        return {
+            pair: min(
+                max(3600 * total / (self.budget_per_hour * weight), self.min_interval_seconds),
+                self.max_interval_seconds,
+            )
+            for pair, weight in weights.items()
+        }
+
+    def take_due(
+        self, now: float, weekday: int, hour: int
+    ) -> list[tuple[str, str]]:
+        due = [pair for pair in self.pairs if self.next_due[pair] <= now]
+        if due:
+            intervals = self.intervals(weekday, hour)
+            for pair in due:
+                self.next_due[pair] = now + intervals[pair]
+        return due
 
 
 def run_forever(
     api_key: str,
     db_path: str,
-    origin: str,
+    origins: Iterable[str],
     destinations: Iterable[str],
     interval_seconds: int,
+    fetcher: ConcurrentFetcher | None = None,
+    timezone_name: str | None = None,
+    jitter_seconds: float = 0.0,
+    missed_slots: str = "skip",
+    sampler: AdaptiveSampler | None = None,
 ) -> None:
-    while True:
-        scrape_once(api_key, db_path, origin, destinations)
-        time.sleep(interval_seconds)
+    origin_list = list(origins)
+    destination_list = list(destinations)
+    if sampler is not None:
+        interval_seconds = sampler.min_interval_seconds
+    scheduler = SlotScheduler(interval_seconds, jitter_seconds, missed_slots)
+    with db.TravelTimeWriter(db_path, timezone_name) as writer:
+
+        def make_attempt() -> Callable[[], None]:
+            if sampler is None:
+                matrices = snapshot_matrices(origin_list, destination_list)
+            else:
+                slot = scheduler.slot_start(scheduler.clock())
+                sampler.refresh(writer.conn, slot)
+                _, _, hour, weekday, _ = db.epoch_local_columns(int(slot), writer.tz)
+                matrices = plan_pair_matrices(sampler.take_due(slot, weekday, hour))
+            return scrape_attempt(api_key, db_path, matrices, fetcher, writer)
+
+        run_scheduled(make_attempt, scheduler)
@@ -0,0 +1,58 @@
+import json
+import os
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+Serializer = Callable[..., bytes]
+
+
+def dumps_stdlib(
+    payload: object,
+    sort_keys: bool = False,
+    default: Callable[[Any], Any] | None = None,
+) -> bytes:
+    return json.dumps(
+        payload,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        sort_keys=sort_keys,
+        default=default,
+    ).encode("utf-8")
+
+
+def dumps_orjson(
+    payload: object,
+    sort_keys: bool = False,
+    default: Callable[[Any], Any] | None = None,
+) -> bytes:
+    option = orjson.OPT_SORT_KEYS if sort_keys else 0
+    if default is not None:
+        # Let the hook decide how dates and dataclasses look, as json does.
+        option |= orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    return orjson.dumps(payload, default=default, option=option)
+
+
+SERIALIZERS: dict[str, Serializer] = {"json": dumps_stdlib}
+if orjson is not None:
+    SERIALIZERS["orjson"] = dumps_orjson
+
+
+def get_serializer(name: str | None = None) -> Serializer:
+    name = name or os.getenv("MAPS_SCRAPER_JSON_BACKEND") or (
+        "orjson" if "orjson" in SERIALIZERS else "json"
+    )
+    if name not in SERIALIZERS:
+        raise ValueError(
+            f"Unknown JSON backend: {name} (available: {', '.join(SERIALIZERS)})"
+        )
+    return SERIALIZERS[name]
+
+
+# Both backends emit the same compact UTF-8 bytes for the strings, integers,
+# lists and dicts we export, so output never depends on whether orjson is
+# installed. Float formatting can differ (1e+16 vs 1e16); round floats first.
+dumps = get_serializer()
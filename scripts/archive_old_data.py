@@ -0,0 +1,65 @@
+import argparse
+import os
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from maps_scraper import archive, db
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Move raw observations older than the retention window into per-year archives.",
+    )
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="Path to the sqlite database (defaults to MAPS_SCRAPER_DB).",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        default=None,
+        help="Directory for per-year archive files (defaults to MAPS_SCRAPER_ARCHIVE_DIR "
+        "or an archive/ directory next to the database).",
+    )
+    parser.add_argument(
+        "--retention-days",
+        type=int,
+        default=None,
+        help="Days of raw observations to keep in the hot database "
+        "(defaults to MAPS_SCRAPER_RETENTION_DAYS).",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    load_dotenv()
+    db_path = args.db or os.getenv("MAPS_SCRAPER_DB", "./data/travel_times.sqlite")
+    archive_dir = args.archive_dir or os.getenv(
+        "MAPS_SCRAPER_ARCHIVE_DIR", str(archive.default_archive_dir(db_path))
+    )
+    retention_days = args.retention_days or int(
+        os.getenv("MAPS_SCRAPER_RETENTION_DAYS", str(archive.DEFAULT_RETENTION_DAYS))
+    )
+
+    conn = db.connect(db_path)
+    try:
+        db.init_db(conn, os.getenv("MAPS_SCRAPER_TIMEZONE"))
+        today = datetime.now(db.load_timezone(db.get_timezone_name(conn))).date()
+        archived = archive.archive_old_observations(
+            conn, archive_dir, archive.archive_cutoff(today, retention_days)
+        )
+        for year, count in archived.items():
+            print(f"Archived {count} rows to {archive.archive_path(archive_dir, year)}")
+        if any(archived.values()):
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
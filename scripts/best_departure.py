@@ -0,0 +1,115 @@
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+
+from maps_scraper import db, departure
+from maps_scraper.config import load_origins
+
+
+def bounded_int(bounds: tuple[int, int]):
+    def parse(value: str) -> int:
+        try:
+            number = int(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid int value: {value!r}") from None
+        if not bounds[0] <= number <= bounds[1]:
+            raise argparse.ArgumentTypeError(
+                f"must be between {bounds[0]} and {bounds[1]}"
+            )
+        return number
+
+    return parse
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Rank departure windows over the next few hours for one trip.",
+    )
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="Path to the sqlite database (defaults to MAPS_SCRAPER_DB).",
+    )
+    parser.add_argument("--destination", required=True)
+    parser.add_argument(
+        "--origin",
+        default=None,
+        help="Origin to leave from (defaults to the first configured origin).",
+    )
+    parser.add_argument(
+        "--direction",
+        choices=("westbound", "eastbound"),
+        default="westbound",
+        help="eastbound drives from the destination back to the origin.",
+    )
+    parser.add_argument(
+        "--hours",
+        type=bounded_int(departure.HORIZON_HOURS_RANGE),
+        default=departure.DEFAULT_HORIZON_HOURS,
+    )
+    parser.add_argument(
+        "--step-minutes",
+        type=bounded_int(departure.STEP_MINUTES_RANGE),
+        default=departure.DEFAULT_STEP_MINUTES,
+    )
+    parser.add_argument(
+        "--limit",
+        type=bounded_int(departure.LIMIT_RANGE),
+        default=departure.DEFAULT_LIMIT,
+    )
+    parser.add_argument(
+        "--at",
+        default=None,
+        help="Plan from this ISO 8601 time instead of now (naive times are local).",
+    )
+    return parser.parse_args()
+
+
+def format_duration(seconds: int) -> str:
+    hours, minutes = divmod(round(seconds / 60), 60)
+    return f"{hours}h{minutes:02d}m"
+
+
+def main() -> int:
+    args = parse_args()
+    load_dotenv()
+    db_path = args.db or os.getenv("MAPS_SCRAPER_DB", "./data/travel_times.sqlite")
+    origin = args.origin or load_origins()[0]
+    trip = (origin, args.destination)
+    if args.direction == "eastbound":
+        trip = trip[::-1]
+
+    conn = db.connect_readonly(db_path)
+    try:
+        tz = db.load_timezone(db.get_timezone_name(conn))
+        try:
+            now = departure.parse_departure_time(args.at, tz) if args.at else int(time.time())
+        except ValueError as exc:
+            raise SystemExit(f"--at: {exc}") from None
+        result = departure.best_departure(
+            conn, *trip, now, args.hours, args.step_minutes, args.limit
+        )
+    finally:
+        conn.close()
+
+    print(f"{trip[0]} -> {trip[1]}, next {args.hours}h")
+    if result["leave_now_seconds"] is not None:
+        print(f"Leave now: {format_duration(result['leave_now_seconds'])}")
+    if result["live_observed_at"] is not None:
+        print(f"Live traffic: x{result['live_ratio']} at {result['live_observed_at']}")
+    if not result["windows"]:
+        print("No hour-of-week profile for this trip yet.")
+    for window in result["windows"]:
+        print(
+            f"{window['rank']}. {window['depart_at']}  "
+            f"{format_duration(window['expected_seconds'])} "
+            f"(p90 {format_duration(window['p90_seconds'])}, "
+            f"{window['samples']} samples)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
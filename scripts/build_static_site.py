@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import os
 import re
@@ -8,6 +9,21 @@ import shutil
 import sqlite3
 from pathlib import Path
 
+from maps_scraper import archive, db
+from maps_scraper.export import (
+    DIRECTIONS,
+    SiteWriter,
+    atomic_write,
+    encode_json,
+    export_all,
+    export_parallel,
+    export_targets,
+    export_tasks,
+    parallel_worthwhile,
+    task_files,
+)
+from maps_scraper.config import load_origins
+
 
 def connect(db_path: str) -> sqlite3.Connection:
     conn = sqlite3.connect(db_path)
@@ -30,122 +46,109 @@ def slugify(label: str, used: set[str]) -> str:
 
 
 def export_index(
-    conn: sqlite3.Connection, origin: str
-) -> tuple[list[dict], list[int], list[dict]]:
-    destinations = [
-        row["destination"]
-        for row in conn.execute(
-            """
-            SELECT DISTINCT destination
-            FROM travel_times
-            WHERE origin = ?
-            ORDER BY destination
-            """,
-            (origin,),
-        ).fetchall()
-    ]
-    years = [
-        int(row["year"])
-        for row in conn.execute(
-            """
-            SELECT DISTINCT strftime('%Y', datetime(observed_at, '-7 hours')) AS year
-            FROM travel_times
-            WHERE origin = ?
-               OR destination = ?
-            ORDER BY year
-            """,
-            (origin, origin),
-        ).fetchall()
-        if row["year"]
-    ]
+    conn: sqlite3.Connection, origins: tuple[str, ...]
+) -> tuple[list[dict], list[dict], list[int], list[dict]]:
+    # daily_summary has one row per pair and day, so this never scans raw rows.
+    origin_destinations: dict[str, list[str]] = {origin: [] for origin in origins}
+    years: set[int] = set()
+    for row in conn.execute(
+        """
+        SELECT origin, destination, substr(local_date, 1, 4) AS year
+        FROM daily_summary
+        GROUP BY origin, destination, year
+        ORDER BY origin, destination
+        """
+    ):
+        if row["origin"] in origin_destinations:
+            destinations = origin_destinations[row["origin"]]
+            if not destinations or destinations[-1] != row["destination"]:
+                destinations.append(row["destination"])
+        if row["origin"] in origin_destinations or row["destination"] in origin_destinations:
+            years.add(int(row["year"]))
 
     used_slugs: set[str] = set()
+    dest_ids = {
+        destination: slugify(destination, used_slugs)
+        for destination in sorted(
+            {label for labels in origin_destinations.values() for label in labels}
+        )
+    }
     dest_entries = [
-        {"id": slugify(destination, used_slugs), "label": destination}
-        for destination in destinations
+        {"id": dest_id, "label": destination} for destination, dest_id in dest_ids.items()
     ]
-    directions = [
-        {"id": "westbound", "label": "Westbound"},
-        {"id": "eastbound", "label": "Eastbound"},
+    used_origin_slugs: set[str] = set()
+    origin_entries = [
+        {
+            "id": slugify(origin, used_origin_slugs),
+            "label": origin,
+            "destinations": [dest_ids[label] for label in origin_destinations[origin]],
+        }
+        for origin in origins
     ]
-    return dest_entries, years, directions
+    return origin_entries, dest_entries, sorted(years), [dict(d) for d in DIRECTIONS]
 
 
-def resolve_trip(origin: str, destination: str, direction: str) -> tuple[str, str]:
-    if direction == "eastbound":
-        return destination, origin
-    return origin, destination
+def write_json(path: Path, payload: dict | list) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, encode_json(payload))
 
 
-def export_calendar(
-    conn: sqlite3.Connection,
-    origin: str,
-    destination: str,
-    year: int,
-    direction: str,
-) -> dict:
-    origin_value, destination_value = resolve_trip(origin, destination, direction)
-    rows = conn.execute(
-        """
-        SELECT date(datetime(observed_at, '-7 hours')) AS day,
-               MAX(duration_seconds) AS max_duration
-        FROM travel_times
-        WHERE origin = ?
-          AND destination = ?
-          AND strftime('%Y', datetime(observed_at, '-7 hours')) = ?
-        GROUP BY day
-        ORDER BY day
-        """,
-        (origin_value, destination_value, str(year)),
-    ).fetchall()
-    return {row["day"]: row["max_duration"] for row in rows}
-
-
-def export_day_details(
-    conn: sqlite3.Connection, origin: str, destination: str, direction: str
-) -> dict[str, list[dict]]:
-    origin_value, destination_value = resolve_trip(origin, destination, direction)
-    rows = conn.execute(
-        """
-        SELECT date(datetime(observed_at, '-7 hours')) AS day,
-               strftime('%Y-%m-%dT%H:%M:%S', datetime(observed_at, '-7 hours')) || '-07:00' AS observed_at,
-               duration_seconds
-        FROM travel_times
-        WHERE origin = ?
-          AND destination = ?
-        ORDER BY observed_at
-        """,
-        (origin_value, destination_value),
-    ).fetchall()
-    data: dict[str, list[dict]] = {}
-    for row in rows:
-        day = row["day"]
-        data.setdefault(day, []).append(
-            {
-                "observed_at": row["observed_at"],
-                "duration_seconds": row["duration_seconds"],
-            }
-        )
-    return data
+MANIFEST_NAME = "build-manifest.json"
+MANIFEST_VERSION = 2
+DAY_LAYOUTS = ("daily", "monthly")
+DATA_FORMATS = ("json", "binary")
 
 
-def write_json(path: Path, payload: dict | list) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as handle:
-        json.dump(payload, handle, indent=2, ensure_ascii=True)
+ASSET_MANIFEST_NAME = "asset-manifest.json"
+FINGERPRINTED_ASSETS = ("static/css/style.css", "static/js/app.js")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
 
 
-def build_static_site(db_path: str, out_dir: Path, clean: bool) -> None:
-    origin = os.getenv("MAPS_SCRAPER_ORIGIN", "Golden, CO")
-    if clean and out_dir.exists():
-        shutil.rmtree(out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
+def fingerprint(relative: str, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    stem, _, extension = relative.rpartition(".")
+    return f"{stem}.{digest}.{extension}"
 
-    static_src = Path("webapp/static")
-    static_dest = out_dir / "static"
-    shutil.copytree(static_src, static_dest, dirs_exist_ok=True)
 
-    index_html = """<!doctype html>
+def load_manifest(out_dir: Path) -> dict | None:
+    path = out_dir / MANIFEST_NAME
+    if not path.exists():
+        return None
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError:
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def plan_incremental_export(
+    conn: sqlite3.Connection,
+    origins: tuple[str, ...],
+    manifest: dict | None,
+    index: dict,
+) -> dict[tuple[str, str, str], set[str]] | None:
+    if (
+        manifest is None
+        or manifest.get("origins") != list(origins)
+        or manifest.get("index") != index
+        # Archiving rebuilds every hour profile without touching any day.
+        or manifest.get("archived_before") != db.get_archived_before(conn)
+    ):
+        return None
+    labels = {dest["label"] for dest in index["destinations"]}
+    changed: dict[tuple[str, str, str], set[str]] = {}
+    for row_origin, row_destination, day in db.changed_days(conn, manifest["revision"]):
+        if row_origin in origins and row_destination in labels:
+            changed.setdefault((row_origin, "westbound", row_destination), set()).add(day)
+        if row_destination in origins and row_origin in labels:
+            changed.setdefault((row_destination, "eastbound", row_origin), set()).add(day)
+    return changed
+
+
+INDEX_HTML = """<!doctype html>
 <html lang="en">
 <head>
   <meta charset="utf-8" />
@@ -164,6 +167,10 @@ def build_static_site(db_path: str, out_dir: Path, clean: bool) -> None:
         </p>
       </div>
       <div class="controls">
+        <label>
+          Origin
+          <select id="origin-select"></select>
+        </label>
         <label>
           Direction
           <select id="direction-select"></select>
@@ -193,6 +200,28 @@ def build_static_site(db_path: str, out_dir: Path, clean: bool) -> None:
       </div>
     </section>
 
+    <section class="departure-section">
+      <div class="departure-header">
+        <div>
+          <h2>Typical departure times</h2>
+          <p id="departure-subtitle">Median and 90th percentile drive time by departure hour.</p>
+        </div>
+        <label>
+          Day
+          <select id="weekday-select">
+            <option value="0">Monday</option>
+            <option value="1">Tuesday</option>
+            <option value="2">Wednesday</option>
+            <option value="3">Thursday</option>
+            <option value="4">Friday</option>
+            <option value="5">Saturday</option>
+            <option value="6">Sunday</option>
+          </select>
+        </label>
+      </div>
+      <div class="chart" id="departure-chart"></div>
+    </section>
+
     <div class="modal" id="detail-modal" aria-hidden="true">
       <div class="modal-backdrop" data-modal-close></div>
       <div class="modal-panel" role="dialog" aria-modal="true">
@@ -213,48 +242,129 @@ def build_static_site(db_path: str, out_dir: Path, clean: bool) -> None:
 </body>
 </html>
 """
-    (out_dir / "index.html").write_text(index_html, encoding="utf-8")
+
+
+def build_static_site(
+    db_path: str,
+    out_dir: Path,
+    clean: bool,
+    incremental: bool = False,
+    day_layout: str = "daily",
+    data_format: str = "json",
+    precompress: bool = False,
+    archive_dir: Path | None = None,
+    jobs: int = 1,
+) -> None:
+    if day_layout not in DAY_LAYOUTS:
+        raise ValueError(f"Unknown day layout: {day_layout}")
+    if jobs < 1:
+        raise ValueError("jobs must be at least 1")
+    if data_format not in DATA_FORMATS:
+        raise ValueError(f"Unknown data format: {data_format}")
+    origins = load_origins()
+    if clean and out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = load_manifest(out_dir)
+    writer = SiteWriter(out_dir, manifest["files"] if manifest else {}, precompress)
+
+    static_src = Path("webapp/static")
+    assets: dict[str, str] = {}
+    for source in sorted(static_src.rglob("*")):
+        if source.is_file():
+            relative = f"static/{source.relative_to(static_src).as_posix()}"
+            content = source.read_bytes()
+            if relative in FINGERPRINTED_ASSETS:
+                assets[relative] = fingerprint(relative, content)
+                relative = assets[relative]
+            writer.write(out_dir / relative, content)
+    if manifest:
+        for stale in set(manifest.get("assets", {}).values()) - set(assets.values()):
+            writer.remove(stale)
+
+    index_html = INDEX_HTML
+    for logical, hashed in assets.items():
+        index_html = index_html.replace(f'"{logical}"', f'"{hashed}"')
+    writer.write(out_dir / "index.html", index_html.encode("utf-8"))
+    writer.write_json(
+        out_dir / ASSET_MANIFEST_NAME,
+        {
+            "assets": assets,
+            "encodings": writer.encodings,
+            "cache_control": {
+                "immutable": IMMUTABLE_CACHE_CONTROL,
+                "default": REVALIDATE_CACHE_CONTROL,
+            },
+            "immutable": sorted(assets.values()),
+        },
+    )
 
     data_root = out_dir / "data"
-    if clean and data_root.exists():
-        shutil.rmtree(data_root)
     data_root.mkdir(parents=True, exist_ok=True)
 
     with connect(db_path) as conn:
-        destinations, years, directions = export_index(conn, origin)
-        write_json(
-            data_root / "index.json",
-            {"destinations": destinations, "years": years, "directions": directions},
+        db.init_db(conn, os.getenv("MAPS_SCRAPER_TIMEZONE"))
+        archive.attach_archives(conn, archive_dir, readonly=False)
+        revision = db.data_revision(conn)
+        archived_before = db.get_archived_before(conn)
+        origin_entries, destinations, years, directions = export_index(conn, origins)
+        index = {
+            "origins": origin_entries,
+            "destinations": destinations,
+            "years": years,
+            "directions": directions,
+            "day_layout": day_layout,
+            "data_format": data_format,
+        }
+        writer.write_json(data_root / "index.json", index)
+        changed = (
+            plan_incremental_export(conn, origins, manifest, index)
+            if incremental
+            else None
         )
 
-        for direction in directions:
-            direction_id = direction["id"]
-            for dest in destinations:
-                dest_id = dest["id"]
-                label = dest["label"]
-                for year in years:
-                    calendar_data = export_calendar(conn, origin, label, year, direction_id)
-                    write_json(
-                        data_root / "calendar" / direction_id / dest_id / f"{year}.json",
-                        {
-                            "destination": label,
-                            "year": year,
-                            "direction": direction_id,
-                            "data": calendar_data,
-                        },
-                    )
-
-                day_details = export_day_details(conn, origin, label, direction_id)
-                for day, entries in day_details.items():
-                    write_json(
-                        data_root / "day" / direction_id / dest_id / f"{day}.json",
-                        {
-                            "destination": label,
-                            "date": day,
-                            "direction": direction_id,
-                            "data": entries,
-                        },
-                    )
+        targets = export_targets(origin_entries, destinations)
+        tasks = export_tasks(targets, changed)
+        if parallel_worthwhile(tasks, jobs):
+            writer.hashes.update(
+                export_parallel(
+                    db_path,
+                    archive_dir,
+                    out_dir,
+                    writer.hashes,
+                    precompress,
+                    tasks,
+                    years,
+                    day_layout,
+                    data_format,
+                    jobs,
+                )
+            )
+        else:
+            if changed is None:
+                exported = export_all(conn, targets, years, day_layout, data_format)
+            else:
+                exported = (
+                    item
+                    for task in tasks
+                    for item in task_files(conn, task, years, day_layout, data_format)
+                )
+            for relative, content in exported:
+                writer.write(data_root / relative, content)
+
+    write_json(
+        out_dir / MANIFEST_NAME,
+        {
+            "version": MANIFEST_VERSION,
+            "revision": revision,
+            "archived_before": archived_before,
+            "origins": list(origins),
+            "index": index,
+            "assets": assets,
+            "files": dict(sorted(writer.hashes.items())),
+        },
+    )
 
 
 def main() -> None:
@@ -276,9 +386,53 @@ def main() -> None:
         action="store_true",
         help="Remove the output directory before rebuilding.",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-export days changed since the last build manifest.",
+    )
+    parser.add_argument(
+        "--day-layout",
+        choices=DAY_LAYOUTS,
+        default="daily",
+        help="Write one day file per date (daily) or one compact shard per month (monthly).",
+    )
+    parser.add_argument(
+        "--data-format",
+        choices=DATA_FORMATS,
+        default="json",
+        help="Encode day observations as JSON or as compact columnar binary (.bin).",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="Write .gz (and .br when brotli is installed) siblings for every file.",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        default=os.getenv("MAPS_SCRAPER_ARCHIVE_DIR"),
+        help="Directory of per-year archive files to read alongside the database "
+        "(defaults to an archive/ directory next to it).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for exporting calendars and day files (0 uses every core).",
+    )
     args = parser.parse_args()
 
-    build_static_site(args.db, Path(args.out), args.clean)
+    build_static_site(
+        args.db,
+        Path(args.out),
+        args.clean,
+        args.incremental,
+        args.day_layout,
+        args.data_format,
+        args.precompress,
+        Path(args.archive_dir or archive.default_archive_dir(args.db)),
+        args.jobs or os.cpu_count() or 1,
+    )
 
 
 if __name__ == "__main__":
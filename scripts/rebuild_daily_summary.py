@@ -0,0 +1,40 @@
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+from maps_scraper import db
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Rebuild the daily_summary and hour_profile rollups from raw travel times.",
+    )
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="Path to the sqlite database (defaults to MAPS_SCRAPER_DB).",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    load_dotenv()
+    db_path = args.db or os.getenv("MAPS_SCRAPER_DB", "./data/travel_times.sqlite")
+
+    conn = db.connect(db_path)
+    try:
+        db.init_db(conn)
+        db.rebuild_daily_summary(conn)
+        db.rebuild_hour_profiles(conn)
+        db.update_planner_stats(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
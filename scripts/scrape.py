@@ -1,28 +1,59 @@
+import logging
 import sys
 
 from maps_scraper.config import load_config
-from maps_scraper.scraper import run_forever, scrape_once
+from maps_scraper.scraper import (
+    AdaptiveSampler,
+    ConcurrentFetcher,
+    run_forever,
+    scrape_once,
+    snapshot_pairs,
+)
 
 
 def main() -> int:
     config = load_config()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+    with ConcurrentFetcher(
+        config.api_key,
+        max_in_flight=config.max_in_flight,
+        rate_per_second=config.rate_per_second,
+    ) as fetcher:
+        if "--once" in sys.argv:
+            scrape_once(
+                api_key=config.api_key,
+                db_path=config.db_path,
+                origins=config.origins,
+                destinations=config.destinations,
+                fetcher=fetcher,
+                timezone_name=config.timezone,
+            )
+            return 0
 
-    if "--once" in sys.argv:
-        scrape_once(
+        sampler = None
+        if config.sampling == "adaptive":
+            sampler = AdaptiveSampler(
+                snapshot_pairs(config.origins, config.destinations),
+                budget_per_hour=config.element_budget_per_hour,
+                min_interval_seconds=config.min_interval_seconds,
+                max_interval_seconds=config.interval_seconds,
+            )
+
+        run_forever(
             api_key=config.api_key,
             db_path=config.db_path,
-            origin=config.origin,
+            origins=config.origins,
             destinations=config.destinations,
+            interval_seconds=config.interval_seconds,
+            fetcher=fetcher,
+            timezone_name=config.timezone,
+            jitter_seconds=config.jitter_seconds,
+            missed_slots=config.missed_slots,
+            sampler=sampler,
         )
-        return 0
-
-    run_forever(
-        api_key=config.api_key,
-        db_path=config.db_path,
-        origin=config.origin,
-        destinations=config.destinations,
-        interval_seconds=config.interval_seconds,
-    )
     return 0
 
 
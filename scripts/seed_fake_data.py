@@ -1,11 +1,17 @@
 import argparse
 import os
-import random
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
+from typing import Iterator
 
+import numpy as np
 from dotenv import load_dotenv
 
 from maps_scraper import db
+from maps_scraper.config import load_origins
+
+RUSH_MULTIPLIERS = np.array(
+    [1.0] * 6 + [1.25] * 4 + [1.0] * 5 + [1.35] * 4 + [1.0] * 5
+)
 
 
 def parse_args() -> argparse.Namespace:
@@ -13,26 +19,86 @@ def parse_args() -> argparse.Namespace:
         description="Seed fake travel-time data into the SQLite database.",
     )
     parser.add_argument("--year", type=int, default=datetime.now().year)
+    parser.add_argument(
+        "--years", type=int, default=1, help="Number of consecutive years to generate."
+    )
     parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--origins",
+        type=int,
+        default=None,
+        help="Generate this many synthetic origins instead of the configured origins.",
+    )
+    parser.add_argument(
+        "--destinations",
+        type=int,
+        default=None,
+        help="Generate this many synthetic destinations instead of MAPS_SCRAPER_DESTINATIONS.",
+    )
+    parser.add_argument(
+        "--cadence-minutes",
+        type=int,
+        default=60,
+        help="Minutes between generated snapshots.",
+    )
+    parser.add_argument(
+        "--chunk-steps",
+        type=int,
+        default=2048,
+        help="Snapshots generated and inserted per batch.",
+    )
     parser.add_argument(
         "--clear",
         action="store_true",
-        help="Delete existing rows for the year before inserting.",
+        help="Delete existing rows for the generated years before inserting.",
     )
     return parser.parse_args()
 
 
-def build_fake_duration(randomizer: random.Random, destination: str, when: datetime) -> int:
-    base = 3600 if "Frisco" in destination else 4200
-    weekend = 1.2 if when.weekday() >= 5 else 1.0
-    hour = when.hour
-    rush = 1.0
-    if 6 <= hour <= 9:
-        rush = 1.25
-    elif 15 <= hour <= 18:
-        rush = 1.35
-    noise = randomizer.randint(-300, 420)
-    return max(1200, int(base * weekend * rush + noise))
+def base_durations(labels: list[str]) -> np.ndarray:
+    return np.array([3600 if "Frisco" in label else 4200 for label in labels])
+
+
+def build_fake_durations(
+    generator: np.random.Generator, base: np.ndarray, epochs: np.ndarray
+) -> np.ndarray:
+    hours = (epochs // 3600) % 24
+    weekdays = (epochs // 86400 + 3) % 7
+    weekend = np.where(weekdays >= 5, 1.2, 1.0)
+    rush = RUSH_MULTIPLIERS[hours]
+    noise = generator.integers(-300, 421, size=(len(epochs), len(base)))
+    durations = (base[np.newaxis, :] * (weekend * rush)[:, np.newaxis]).astype(np.int64)
+    return np.maximum(1200, durations + noise)
+
+
+def generate_rows(
+    generator: np.random.Generator,
+    pairs: list[tuple[str, str]],
+    start_epoch: int,
+    end_epoch: int,
+    cadence_seconds: int,
+    chunk_steps: int,
+    timezone_name: str,
+) -> Iterator[list[tuple]]:
+    tz = db.load_timezone(timezone_name)
+    base = base_durations([destination for _, destination in pairs])
+    for chunk_start in range(start_epoch, end_epoch, cadence_seconds * chunk_steps):
+        chunk_end = min(end_epoch, chunk_start + cadence_seconds * chunk_steps)
+        epochs = np.arange(chunk_start, chunk_end, cadence_seconds, dtype=np.int64)
+        durations = build_fake_durations(generator, base, epochs).tolist()
+        steps = [
+            (
+                datetime.fromtimestamp(epoch, timezone.utc).isoformat(),
+                epoch,
+                *db.epoch_local_columns(epoch, tz),
+            )
+            for epoch in epochs.tolist()
+        ]
+        yield [
+            (origin, destination, duration, None, *step)
+            for step, step_durations in zip(steps, durations)
+            for (origin, destination), duration in zip(pairs, step_durations)
+        ]
 
 
 def main() -> int:
@@ -40,57 +106,60 @@ def main() -> int:
     load_dotenv()
 
     db_path = os.getenv("MAPS_SCRAPER_DB", "./data/travel_times.sqlite")
-    origin = os.getenv("MAPS_SCRAPER_ORIGIN", "Golden, CO")
-    destinations = tuple(
-        d.strip()
-        for d in os.getenv(
-            "MAPS_SCRAPER_DESTINATIONS",
-            "Frisco, CO;Winter Park, CO",
-        ).split(";")
-        if d.strip()
+    if args.origins:
+        origins = tuple(f"Origin {index:02d}" for index in range(1, args.origins + 1))
+    else:
+        origins = load_origins()
+    if args.destinations:
+        destinations = tuple(
+            f"Destination {index:03d}" for index in range(1, args.destinations + 1)
+        )
+    else:
+        destinations = tuple(
+            d.strip()
+            for d in os.getenv(
+                "MAPS_SCRAPER_DESTINATIONS",
+                "Frisco, CO;Winter Park, CO",
+            ).split(";")
+            if d.strip()
+        )
+    pairs = [
+        pair
+        for origin in origins
+        for destination in destinations
+        for pair in ((origin, destination), (destination, origin))
+    ]
+
+    generator = np.random.default_rng(args.seed)
+    start_epoch = int(datetime(args.year, 1, 1, tzinfo=timezone.utc).timestamp())
+    end_epoch = int(
+        datetime(args.year + args.years, 1, 1, tzinfo=timezone.utc).timestamp()
     )
 
-    randomizer = random.Random(args.seed)
-    start = datetime(args.year, 1, 1, tzinfo=timezone.utc)
-    end = datetime(args.year + 1, 1, 1, tzinfo=timezone.utc)
-
     conn = db.connect(db_path)
     try:
-        db.init_db(conn)
+        db.init_db(conn, os.getenv("MAPS_SCRAPER_TIMEZONE"))
+        conn.execute("PRAGMA synchronous = OFF")
         if args.clear:
             conn.execute(
-                "DELETE FROM travel_times WHERE substr(observed_at, 1, 4) = ?",
-                (str(args.year),),
+                "DELETE FROM observations WHERE observed_epoch >= ? AND observed_epoch < ?",
+                (start_epoch, end_epoch),
             )
-            conn.commit()
-
-        rows = []
-        current = start
-        while current < end:
-            for destination in destinations:
-                duration = build_fake_duration(randomizer, destination, current)
-                rows.append(
-                    (
-                        origin,
-                        destination,
-                        duration,
-                        None,
-                        current.isoformat(),
-                    )
-                )
-                reverse_duration = build_fake_duration(randomizer, origin, current)
-                rows.append(
-                    (
-                        destination,
-                        origin,
-                        reverse_duration,
-                        None,
-                        current.isoformat(),
-                    )
-                )
-            current += timedelta(hours=1)
-
-        db.insert_travel_times(conn, rows)
+
+        for batch in generate_rows(
+            generator,
+            pairs,
+            start_epoch,
+            end_epoch,
+            args.cadence_minutes * 60,
+            args.chunk_steps,
+            db.get_timezone_name(conn),
+        ):
+            db.bulk_insert_travel_times(conn, batch)
+
+        db.rebuild_daily_summary(conn)
+        db.rebuild_hour_profiles(conn)
+        conn.commit()
     finally:
         conn.close()
 
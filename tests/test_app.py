@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import threading
+from datetime import date
+
+import pytest
+
+from maps_scraper import db
+from webapp.app import create_app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "travel.sqlite")
+    monkeypatch.setenv("MAPS_SCRAPER_DB", db_path)
+    monkeypatch.setenv("MAPS_SCRAPER_ORIGIN", "Golden, CO")
+    conn = db.connect(db_path)
+    try:
+        db.init_db(conn)
+        db.insert_travel_times(
+            conn,
+            [
+                ("Golden, CO", "Frisco, CO", 3600, None, "2024-01-01T06:00:00+00:00"),
+                ("Golden, CO", "Frisco, CO", 4000, None, "2024-01-01T08:00:00+00:00"),
+                ("Golden, CO", "Frisco, CO", 4200, None, "2024-01-01T20:00:00+00:00"),
+                ("Frisco, CO", "Golden, CO", 3900, None, "2024-01-01T20:00:00+00:00"),
+            ],
+        )
+    finally:
+        conn.close()
+    return create_app().test_client()
+
+
+def test_calendar_groups_by_local_day(client):
+    response = client.get("/api/calendar?destination=Frisco, CO&year=2024")
+
+    assert response.status_code == 200
+    assert response.get_json()["data"] == {"2024-01-01": 4200}
+
+
+def test_calendar_rejects_non_ascii_year(client):
+    response = client.get("/api/calendar?destination=Frisco, CO&year=\u00b2")
+
+    assert response.status_code == 400
+
+
+def test_day_returns_local_observations(client):
+    response = client.get("/api/day?destination=Frisco, CO&date=2024-01-01&direction=eastbound")
+
+    assert response.get_json()["data"] == [
+        {"observed_at": "2024-01-01T13:00:00-07:00", "duration_seconds": 3900}
+    ]
+
+
+def test_years_per_direction(client):
+    assert client.get("/api/years").get_json() == {"years": [2023, 2024]}
+    assert client.get("/api/years?direction=eastbound").get_json() == {"years": [2024]}
+
+
+def test_json_responses_keep_flask_key_order_and_default_hook(client):
+    response = client.get("/api/calendar?destination=Frisco, CO&year=2024")
+
+    assert response.data.startswith(b'{"data":{"2024-01-01":4200},"destination":')
+    assert response.data.endswith(b"}\n")
+    with client.application.app_context():
+        assert client.application.json.dumps({"day": date(2024, 1, 2)}) == (
+            '{"day":"Tue, 02 Jan 2024 00:00:00 GMT"}'
+        )
+
+
+def test_requests_reuse_one_read_only_connection(client, monkeypatch):
+    opened = []
+    connect_readonly = db.connect_readonly
+
+    def tracking_connect(db_path):
+        conn = connect_readonly(db_path)
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(db, "connect_readonly", tracking_connect)
+
+    for _ in range(3):
+        assert client.get("/api/years").status_code == 200
+    assert client.get("/api/calendar?destination=Frisco, CO&year=2024").status_code == 200
+    # The threaded dev server runs each request on a fresh thread.
+    statuses = []
+    for _ in range(3):
+        worker = threading.Thread(
+            target=lambda: statuses.append(client.get("/api/years?direction=eastbound").status_code)
+        )
+        worker.start()
+        worker.join()
+    assert statuses == [200, 200, 200]
+
+    assert len(opened) == 1
+    with pytest.raises(sqlite3.OperationalError):
+        opened[0].execute("DELETE FROM travel_times")
+
+
+def test_etag_and_cache_invalidation_on_insert(client, monkeypatch):
+    url = "/api/calendar?destination=Frisco, CO&year=2024"
+    first = client.get(url)
+    etag = first.headers["ETag"]
+    assert not etag.startswith("W/")
+
+    not_modified = client.get(url, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b""
+
+    conn = db.connect(os.environ["MAPS_SCRAPER_DB"])
+    try:
+        db.insert_travel_times(
+            conn, [("Golden, CO", "Frisco, CO", 9000, None, "2024-01-01T21:00:00+00:00")]
+        )
+    finally:
+        conn.close()
+
+    refreshed = client.get(url, headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.get_json()["data"] == {"2024-01-01": 9000}
+    assert refreshed.headers["ETag"] != etag
+
+
+def test_endpoints_are_keyed_by_origin(client, monkeypatch):
+    monkeypatch.setenv("MAPS_SCRAPER_ORIGINS", "Golden, CO;Boulder, CO")
+    conn = db.connect(os.environ["MAPS_SCRAPER_DB"])
+    try:
+        db.insert_travel_times(
+            conn, [("Boulder, CO", "Frisco, CO", 5400, None, "2024-01-01T18:00:00+00:00")]
+        )
+    finally:
+        conn.close()
+    client = create_app().test_client()
+
+    boulder = client.get("/api/calendar?destination=Frisco, CO&year=2024&origin=Boulder, CO")
+    default = client.get("/api/calendar?destination=Frisco, CO&year=2024")
+    unknown = client.get("/api/years?origin=Denver, CO")
+
+    assert boulder.get_json()["data"] == {"2024-01-01": 5400}
+    assert boulder.get_json()["origin"] == "Boulder, CO"
+    assert default.get_json()["data"] == {"2024-01-01": 4200}
+    assert unknown.status_code == 400
+    assert b'<option value="Boulder, CO">' in client.get("/").data
+
+
+def test_profile_returns_hour_of_week_buckets(client):
+    conn = db.connect(os.environ["MAPS_SCRAPER_DB"])
+    try:
+        db.insert_travel_times(
+            conn, [("Golden, CO", "Frisco, CO", 5000, None, "2024-01-08T20:00:00+00:00")]
+        )
+    finally:
+        conn.close()
+
+    payload = client.get("/api/profile?destination=Frisco, CO").get_json()
+    monday_1pm = [entry for entry in payload["data"] if (entry["weekday"], entry["hour"]) == (0, 13)]
+
+    assert len(payload["data"]) == 3
+    assert monday_1pm == [
+        {"weekday": 0, "hour": 13, "count": 2, "mean": 4600, "p50": 4200, "p90": 5000, "max": 5000}
+    ]
+    assert client.get("/api/profile").status_code == 400
+
+
+def test_best_departure_ranks_windows(client):
+    payload = client.get(
+        "/api/best-departure?destination=Frisco, CO&at=2024-01-01T13:00&hours=1&step=30"
+    ).get_json()
+
+    assert payload["live_observed_at"] == "2024-01-01T13:00:00-07:00"
+    assert payload["leave_now_seconds"] == 4200
+    assert [window["depart_at"] for window in payload["windows"]] == [
+        "2024-01-01T13:00:00-07:00",
+        "2024-01-01T13:30:00-07:00",
+        "2024-01-01T14:00:00-07:00",
+    ]
+    assert client.get("/api/best-departure").status_code == 400
+    assert client.get("/api/best-departure?destination=Frisco, CO&hours=0").status_code == 400
+    assert client.get("/api/best-departure?destination=Frisco, CO&at=soon").status_code == 400
+    assert client.get("/api/best-departure?destination=Frisco, CO&hours=\u00b2").status_code == 400
+    assert (
+        client.get("/api/best-departure?destination=Frisco, CO&at=9999-12-31T23:00").status_code
+        == 400
+    )
@@ -0,0 +1,134 @@
+import importlib.util
+import json
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from maps_scraper import archive, db
+from webapp.app import create_app
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+spec = importlib.util.spec_from_file_location(
+    "build_static_site", REPO_ROOT / "scripts" / "build_static_site.py"
+)
+build_static_site = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(build_static_site)
+
+ROWS = [
+    ("Golden, CO", "Frisco, CO", 3600, None, "2023-06-01T18:00:00+00:00"),
+    ("Golden, CO", "Frisco, CO", 3900, None, "2023-06-01T20:00:00+00:00"),
+    ("Golden, CO", "Frisco, CO", 3700, None, "2024-01-15T18:00:00+00:00"),
+    ("Golden, CO", "Frisco, CO", 3800, None, "2024-03-02T18:00:00+00:00"),
+]
+
+
+def test_archive_cutoff_rounds_down_to_month():
+    assert archive.archive_cutoff(date(2024, 3, 20), 30) == "2024-02-01"
+
+
+def test_archived_rows_stay_readable(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "travel.sqlite")
+    archive_dir = archive.default_archive_dir(db_path)
+    conn = db.connect(db_path)
+    try:
+        db.init_db(conn)
+        db.insert_travel_times(conn, ROWS)
+        summaries = conn.execute("SELECT * FROM daily_summary ORDER BY local_date").fetchall()
+
+        archived = archive.archive_old_observations(conn, archive_dir, "2024-02-01")
+        assert archived == {2023: 2, 2024: 1}
+        assert conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0] == 1
+
+        db.rebuild_daily_summary(conn)
+        conn.commit()
+        assert [row[:-1] for row in conn.execute(
+            "SELECT * FROM daily_summary ORDER BY local_date"
+        )] == [row[:-1] for row in summaries]
+    finally:
+        conn.close()
+    assert archive.archive_years(archive_dir) == [2023, 2024]
+
+    reader = db.connect_readonly(db_path)
+    try:
+        assert archive.attach_archives(reader, archive_dir) == [2023, 2024]
+        assert reader.execute("SELECT COUNT(*) FROM travel_times").fetchone()[0] == 4
+    finally:
+        reader.close()
+
+    monkeypatch.chdir(REPO_ROOT)
+    monkeypatch.setenv("MAPS_SCRAPER_DB", db_path)
+    monkeypatch.setenv("MAPS_SCRAPER_ORIGIN", "Golden, CO")
+    response = create_app().test_client().get(
+        "/api/day?destination=Frisco, CO&date=2023-06-01"
+    )
+    assert [row["duration_seconds"] for row in response.get_json()["data"]] == [3600, 3900]
+
+    out_dir = tmp_path / "site"
+    build_static_site.build_static_site(
+        db_path, out_dir, clean=True, archive_dir=archive_dir
+    )
+    day = out_dir / "data/day/golden-co/westbound/frisco-co/2023-06-01.json"
+    assert len(json.loads(day.read_text())["data"]) == 2
+
+
+def test_running_app_sees_rows_archived_after_startup(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "travel.sqlite")
+    conn = db.connect(db_path)
+    try:
+        db.init_db(conn)
+        db.insert_travel_times(conn, ROWS)
+    finally:
+        conn.close()
+    monkeypatch.setenv("MAPS_SCRAPER_DB", db_path)
+    monkeypatch.setenv("MAPS_SCRAPER_ORIGIN", "Golden, CO")
+    client = create_app().test_client()
+    url = "/api/day?destination=Frisco, CO&date=2023-06-01"
+    assert len(client.get(url).get_json()["data"]) == 2
+    assert sum(entry["count"] for entry in client.get(
+        "/api/profile?destination=Frisco, CO"
+    ).get_json()["data"]) == 4
+
+    conn = db.connect(db_path)
+    try:
+        archive.archive_old_observations(
+            conn, archive.default_archive_dir(db_path), "2024-02-01"
+        )
+    finally:
+        conn.close()
+
+    assert len(client.get(url).get_json()["data"]) == 2
+    assert len(client.get(url + "&direction=westbound").get_json()["data"]) == 2
+    assert sum(entry["count"] for entry in client.get(
+        "/api/profile?destination=Frisco, CO"
+    ).get_json()["data"]) == 1
+
+
+def test_failed_archive_surfaces_the_original_error(tmp_path):
+    db_path = str(tmp_path / "travel.sqlite")
+    archive_dir = archive.default_archive_dir(db_path)
+    archive._create_archive(archive.archive_path(archive_dir, 2023))
+    pinned = sqlite3.connect(archive.archive_path(archive_dir, 2023))
+    pinned.execute(
+        """
+        CREATE TRIGGER reject_rows BEFORE INSERT ON observations
+        BEGIN SELECT RAISE(ABORT, 'archive is read-only'); END
+        """
+    )
+    pinned.commit()
+    pinned.close()
+
+    conn = db.connect(db_path)
+    try:
+        db.init_db(conn)
+        db.insert_travel_times(conn, ROWS)
+        with pytest.raises(sqlite3.IntegrityError, match="read-only"):
+            archive.archive_old_observations(conn, archive_dir, "2024-02-01")
+        schemas = [row[1] for row in conn.execute("PRAGMA database_list")]
+        hot_rows = conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0]
+    finally:
+        conn.close()
+
+    assert "archive" not in schemas
+    assert hot_rows == 4
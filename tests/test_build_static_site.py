@@ -0,0 +1,186 @@
+import gzip
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+
+from maps_scraper import db, export
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+spec = importlib.util.spec_from_file_location(
+    "build_static_site", REPO_ROOT / "scripts" / "build_static_site.py"
+)
+build_static_site = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(build_static_site)
+
+
+def insert(db_path, rows):
+    conn = db.connect(db_path)
+    try:
+        db.init_db(conn)
+        db.insert_travel_times(conn, rows)
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def seeded_db(tmp_path, monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    monkeypatch.setenv("MAPS_SCRAPER_ORIGIN", "Golden, CO")
+    db_path = str(tmp_path / "travel.sqlite")
+    insert(
+        db_path,
+        [
+            ("Golden, CO", "Frisco, CO", 3600, None, "2024-01-01T18:00:00+00:00"),
+            ("Frisco, CO", "Golden, CO", 3700, None, "2024-01-01T18:00:00+00:00"),
+            ("Golden, CO", "Frisco, CO", 3800, None, "2024-01-02T18:00:00+00:00"),
+            ("Golden, CO", "Winter Park, CO", 4000, None, "2024-01-02T18:00:00+00:00"),
+        ],
+    )
+    return db_path
+
+
+def snapshot(out_dir):
+    return {
+        path.relative_to(out_dir).as_posix(): (path.stat().st_mtime_ns, path.read_bytes())
+        for path in out_dir.rglob("*")
+        if path.is_file()
+    }
+
+
+def test_incremental_build_only_touches_changed_files(seeded_db, tmp_path):
+    out_dir = tmp_path / "site"
+    build_static_site.build_static_site(seeded_db, out_dir, clean=True)
+    before = snapshot(out_dir)
+
+    insert(seeded_db, [("Golden, CO", "Frisco, CO", 5000, None, "2024-01-02T20:00:00+00:00")])
+    build_static_site.build_static_site(seeded_db, out_dir, clean=False, incremental=True)
+    after = snapshot(out_dir)
+
+    changed = sorted(path for path in after if after[path] != before.get(path))
+    assert changed == [
+        "build-manifest.json",
+        "data/calendar/golden-co/westbound/frisco-co/2024.json",
+        "data/day/golden-co/westbound/frisco-co/2024-01-02.json",
+        "data/profile/golden-co/westbound/frisco-co.json",
+    ]
+    full_dir = tmp_path / "full"
+    build_static_site.build_static_site(seeded_db, full_dir, clean=True)
+    full = snapshot(full_dir)
+    assert {path: data for path, (_, data) in after.items()} == {
+        path: data for path, (_, data) in full.items()
+    }
+
+
+def test_incremental_build_without_manifest_exports_everything(seeded_db, tmp_path):
+    out_dir = tmp_path / "site"
+    build_static_site.build_static_site(seeded_db, out_dir, clean=False, incremental=True)
+
+    manifest = json.loads((out_dir / "build-manifest.json").read_text())
+    assert "data/day/golden-co/eastbound/frisco-co/2024-01-01.json" in manifest["files"]
+    assert manifest["revision"] == 1
+
+
+def test_monthly_layout_packs_days_into_compact_shards(seeded_db, tmp_path):
+    out_dir = tmp_path / "site"
+    build_static_site.build_static_site(seeded_db, out_dir, clean=True, day_layout="monthly")
+
+    day_dir = out_dir / "data" / "day" / "golden-co" / "westbound" / "frisco-co"
+    shard = day_dir / "2024-01.json"
+    assert [path.name for path in day_dir.iterdir()] == ["2024-01.json"]
+    assert b"\n" not in shard.read_bytes()
+    payload = json.loads(shard.read_text())
+    assert payload["month"] == "2024-01"
+    assert payload["days"]["2024-01-02"] == [
+        {"observed_at": "2024-01-02T11:00:00-07:00", "duration_seconds": 3800}
+    ]
+    index = json.loads((out_dir / "data" / "index.json").read_text())
+    assert index["day_layout"] == "monthly"
+
+
+def test_precompressed_fingerprinted_assets(seeded_db, tmp_path):
+    out_dir = tmp_path / "site"
+    build_static_site.build_static_site(seeded_db, out_dir, clean=True, precompress=True)
+
+    asset_manifest = json.loads((out_dir / "asset-manifest.json").read_text())
+    app_js = asset_manifest["assets"]["static/js/app.js"]
+    assert app_js != "static/js/app.js"
+    assert (out_dir / app_js).read_bytes() == (REPO_ROOT / "webapp/static/js/app.js").read_bytes()
+    assert app_js in asset_manifest["immutable"]
+    index_html = (out_dir / "index.html").read_text()
+    assert f'src="{app_js}"' in index_html
+    assert 'href="static/css/style.css"' not in index_html
+    index_json = out_dir / "data" / "index.json"
+    gzipped = index_json.with_name("index.json.gz").read_bytes()
+    assert gzip.decompress(gzipped) == index_json.read_bytes()
+    assert (out_dir / (app_js + ".gz")).exists()
+
+
+def test_exports_are_keyed_by_origin(seeded_db, tmp_path, monkeypatch):
+    monkeypatch.setenv("MAPS_SCRAPER_ORIGINS", "Golden, CO;Boulder, CO")
+    insert(seeded_db, [("Vail, CO", "Boulder, CO", 7200, None, "2024-01-03T18:00:00+00:00")])
+    out_dir = tmp_path / "site"
+    build_static_site.build_static_site(seeded_db, out_dir, clean=True)
+
+    index = json.loads((out_dir / "data" / "index.json").read_text())
+    assert [(o["id"], o["destinations"]) for o in index["origins"]] == [
+        ("golden-co", ["frisco-co", "winter-park-co"]),
+        ("boulder-co", []),
+    ]
+
+    insert(seeded_db, [("Boulder, CO", "Vail, CO", 6000, None, "2024-01-03T19:00:00+00:00")])
+    before = snapshot(out_dir)
+    build_static_site.build_static_site(seeded_db, out_dir, clean=False, incremental=True)
+    after = snapshot(out_dir)
+
+    changed = sorted(path for path in after if after[path] != before.get(path))
+    assert "data/index.json" in changed
+    calendar = json.loads(
+        (out_dir / "data/calendar/boulder-co/eastbound/vail-co/2024.json").read_text()
+    )
+    assert calendar["origin"] == "Boulder, CO"
+    assert calendar["data"] == {"2024-01-03": 7200}
+    assert (out_dir / "data/day/boulder-co/westbound/vail-co/2024-01-03.json").exists()
+    assert not (out_dir / "data/day/golden-co/westbound/vail-co").exists()
+
+
+@pytest.mark.parametrize("day_layout", ["daily", "monthly"])
+def test_parallel_build_matches_serial_build(seeded_db, tmp_path, monkeypatch, day_layout):
+    # Two changed trips on one day each: enough tasks for the pool, and the
+    # day threshold is lowered so they clear it.
+    monkeypatch.setattr(export, "PARALLEL_MIN_CHANGED_DAYS", 1)
+    pool_runs = []
+
+    def spy_export_parallel(*args):
+        pool_runs.append([kind for kind, _, _ in args[5]])
+        return export.export_parallel(*args)
+
+    monkeypatch.setattr(build_static_site, "export_parallel", spy_export_parallel)
+    serial_dir = tmp_path / "serial"
+    parallel_dir = tmp_path / "parallel"
+    build_static_site.build_static_site(seeded_db, serial_dir, clean=True, day_layout=day_layout)
+    build_static_site.build_static_site(
+        seeded_db, parallel_dir, clean=True, day_layout=day_layout, jobs=2
+    )
+
+    insert(
+        seeded_db,
+        [
+            ("Golden, CO", "Frisco, CO", 5000, None, "2024-01-02T20:00:00+00:00"),
+            ("Frisco, CO", "Golden, CO", 5100, None, "2024-01-02T20:00:00+00:00"),
+        ],
+    )
+    build_static_site.build_static_site(
+        seeded_db, serial_dir, clean=False, incremental=True, day_layout=day_layout
+    )
+    build_static_site.build_static_site(
+        seeded_db, parallel_dir, clean=False, incremental=True, day_layout=day_layout, jobs=2
+    )
+
+    assert pool_runs[-1] == ["changed", "changed"]
+
+    serial = {path: data for path, (_, data) in snapshot(serial_dir).items()}
+    parallel = {path: data for path, (_, data) in snapshot(parallel_dir).items()}
+    assert parallel == serial
+    assert not [path for path in parallel if path.endswith(".tmp")]
@@ -0,0 +1,286 @@
+import sqlite3
+
+from maps_scraper import db
+
+
+def create_legacy_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        CREATE TABLE travel_times (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            duration_seconds INTEGER NOT NULL,
+            distance_meters INTEGER,
+            observed_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX idx_travel_times_origin_dest_time ON travel_times (origin, destination, observed_at)"
+    )
+    conn.executemany(
+        """
+        INSERT INTO travel_times (origin, destination, duration_seconds, distance_meters, observed_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [
+            ("Golden, CO", "Frisco, CO", 3600, None, "2024-01-01T06:00:00+00:00"),
+            ("Golden, CO", "Frisco, CO", 4000, None, "2024-01-01T08:00:00+00:00"),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_init_db_backfills_local_time_columns(tmp_path):
+    db_path = str(tmp_path / "legacy.sqlite")
+    create_legacy_db(db_path)
+
+    conn = db.connect(db_path)
+    try:
+        db.init_db(conn)
+        db.init_db(conn)
+        rows = conn.execute(
+            "SELECT observed_epoch, local_date, local_year FROM travel_times ORDER BY observed_epoch"
+        ).fetchall()
+        plan = conn.execute(
+            """
+            EXPLAIN QUERY PLAN
+            SELECT local_date, MAX(duration_seconds) FROM travel_times
+            WHERE origin = ? AND destination = ? AND local_date >= ? AND local_date < ?
+            GROUP BY local_date
+            """,
+            ("Golden, CO", "Frisco, CO", "2023-01-01", "2024-01-01"),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    assert rows == [(1704088800, "2023-12-31", 2023), (1704096000, "2024-01-01", 2024)]
+    assert "idx_observations_pair_local" in " ".join(row[-1] for row in plan)
+
+
+def test_insert_travel_times_matches_backfill(tmp_path):
+    conn = db.connect(str(tmp_path / "travel.sqlite"))
+    try:
+        db.init_db(conn)
+        db.insert_travel_times(
+            conn, [("Golden, CO", "Frisco, CO", 3600, None, "2024-01-01T06:00:00+00:00")]
+        )
+        row = conn.execute(
+            f"SELECT observed_epoch, local_date, local_year, {db.local_iso_sql()} FROM travel_times"
+        ).fetchone()
+    finally:
+        conn.close()
+
+    assert row == (1704088800, "2023-12-31", 2023, "2023-12-31T23:00:00-07:00")
+
+
+def test_daily_summary_tracks_inserts_and_rebuild(tmp_path):
+    conn = db.connect(str(tmp_path / "travel.sqlite"))
+    try:
+        db.init_db(conn)
+        for hour, duration in enumerate(range(3600, 4600, 100)):
+            db.insert_travel_times(
+                conn,
+                [("Golden, CO", "Frisco, CO", duration, None, f"2024-01-02T{hour + 7:02d}:00:00+00:00")],
+            )
+        query = """
+            SELECT origin, destination, local_date, max_duration, min_duration,
+                   mean_duration, sample_count, p90_duration
+            FROM daily_summary
+            ORDER BY local_date
+        """
+        incremental = conn.execute(query).fetchall()
+        revision = db.data_revision(conn)
+        db.rebuild_daily_summary(conn)
+        rebuilt = conn.execute(query).fetchall()
+        rebuilt_revision = db.data_revision(conn)
+    finally:
+        conn.close()
+
+    assert incremental == [
+        ("Golden, CO", "Frisco, CO", "2024-01-02", 4500, 3600, 4050.0, 10, 4400)
+    ]
+    assert rebuilt == incremental
+    assert revision == 10
+    assert rebuilt_revision == 11
+
+
+def test_changed_days_since_revision(tmp_path):
+    conn = db.connect(str(tmp_path / "travel.sqlite"))
+    try:
+        db.init_db(conn)
+        db.insert_travel_times(
+            conn, [("Golden, CO", "Frisco, CO", 3600, None, "2024-01-02T12:00:00+00:00")]
+        )
+        revision = db.data_revision(conn)
+        db.insert_travel_times(
+            conn, [("Frisco, CO", "Golden, CO", 3600, None, "2024-01-03T12:00:00+00:00")]
+        )
+        changed = db.changed_days(conn, revision)
+    finally:
+        conn.close()
+
+    assert changed == [("Frisco, CO", "Golden, CO", "2024-01-03")]
+
+
+def test_local_time_dimension_follows_dst_and_timezone_changes(tmp_path):
+    conn = db.connect(str(tmp_path / "travel.sqlite"))
+    try:
+        db.init_db(conn)
+        db.insert_travel_times(
+            conn, [("Golden, CO", "Frisco, CO", 3600, None, "2024-07-01T06:30:00+00:00")]
+        )
+        query = f"""
+            SELECT local_date, local_year, local_hour, local_weekday, utc_offset_minutes,
+                   {db.local_iso_sql()}
+            FROM travel_times
+        """
+        denver = conn.execute(query).fetchone()
+        db.init_db(conn, "UTC")
+        utc = conn.execute(query).fetchone()
+        summary_days = [row[0] for row in conn.execute("SELECT local_date FROM daily_summary")]
+    finally:
+        conn.close()
+
+    assert denver == ("2024-07-01", 2024, 0, 0, -360, "2024-07-01T00:30:00-06:00")
+    assert utc == ("2024-07-01", 2024, 6, 0, 0, "2024-07-01T06:30:00+00:00")
+    assert summary_days == ["2024-07-01"]
+
+
+def test_writer_commits_each_snapshot_atomically(tmp_path):
+    db_path = str(tmp_path / "travel.sqlite")
+
+    def snapshot(timestamp, fail_after=None):
+        for index, destination in enumerate(["Frisco, CO", "Vail, CO"]):
+            if index == fail_after:
+                raise RuntimeError("fetch interrupted")
+            yield ("Golden, CO", destination, 3600, None, timestamp)
+
+    with db.TravelTimeWriter(db_path) as writer:
+        writer.write_snapshot(snapshot("2024-01-02T12:00:00+00:00"))
+        try:
+            writer.write_snapshot(snapshot("2024-01-02T12:15:00+00:00", fail_after=1))
+        except RuntimeError:
+            pass
+        writer.write_snapshot(snapshot("2024-01-02T12:30:00+00:00"))
+
+    conn = sqlite3.connect(db_path)
+    try:
+        observed = conn.execute(
+            "SELECT DISTINCT observed_at FROM travel_times ORDER BY observed_at"
+        ).fetchall()
+        counts = conn.execute(
+            "SELECT destination, sample_count FROM daily_summary ORDER BY destination"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    assert observed == [("2024-01-02T12:00:00+00:00",), ("2024-01-02T12:30:00+00:00",)]
+    assert counts == [("Frisco, CO", 2), ("Vail, CO", 2)]
+
+
+def test_locations_dimension_replaces_text_keys(tmp_path):
+    db_path = str(tmp_path / "legacy.sqlite")
+    create_legacy_db(db_path)
+
+    conn = db.connect(db_path)
+    try:
+        db.init_db(conn)
+        db.insert_travel_times(
+            conn, [("Golden, CO", "Vail, CO", 5400, 150000, "2024-01-01T08:00:00+00:00")]
+        )
+        db.insert_travel_times(
+            conn, [("Golden, CO", "Vail, CO", 5500, 150000, "2024-01-01T08:00:00.5+00:00")]
+        )
+        locations = conn.execute("SELECT id, name FROM locations ORDER BY id").fetchall()
+        stored = conn.execute(
+            "SELECT origin_id, destination_id, observed_epoch, duration_seconds FROM observations"
+            " ORDER BY origin_id, destination_id, observed_epoch"
+        ).fetchall()
+        view = conn.execute(
+            "SELECT origin, destination, observed_at, duration_seconds FROM travel_times"
+            " WHERE destination = 'Vail, CO'"
+        ).fetchall()
+        kinds = dict(
+            conn.execute(
+                "SELECT name, type FROM sqlite_master WHERE name IN ('travel_times', 'observations')"
+            ).fetchall()
+        )
+    finally:
+        conn.close()
+
+    assert locations == [(1, "Frisco, CO"), (2, "Golden, CO"), (3, "Vail, CO")]
+    assert stored == [(2, 1, 1704088800, 3600), (2, 1, 1704096000, 4000), (2, 3, 1704096000, 5500)]
+    assert view == [("Golden, CO", "Vail, CO", "2024-01-01T08:00:00+00:00", 5500)]
+    assert kinds == {"travel_times": "view", "observations": "table"}
+
+
+def test_hour_profiles_track_inserts_and_rebuild(tmp_path):
+    conn = db.connect(str(tmp_path / "travel.sqlite"))
+    try:
+        db.init_db(conn)
+        # Mondays at 07:00 America/Denver across three weeks.
+        for day, duration in (("08", 3600), ("15", 4200), ("22", 3900)):
+            db.insert_travel_times(
+                conn, [("Golden, CO", "Frisco, CO", duration, None, f"2024-01-{day}T14:00:00+00:00")]
+            )
+        incremental = conn.execute("SELECT * FROM hour_profile").fetchall()
+        db.rebuild_hour_profiles(conn)
+        rebuilt = conn.execute("SELECT * FROM hour_profile").fetchall()
+    finally:
+        conn.close()
+
+    assert incremental == rebuilt == [("Golden, CO", "Frisco, CO", 0, 7, 3, 3900.0, 3900, 4200, 4200)]
+
+
+def test_init_db_only_analyzes_when_stats_are_missing_or_rebuilt(tmp_path):
+    db_path = str(tmp_path / "travel.sqlite")
+    conn = db.connect(db_path)
+    try:
+        db.init_db(conn)
+        db.insert_travel_times(
+            conn, [("Golden, CO", "Frisco, CO", 3600, None, "2024-01-02T18:00:00+00:00")]
+        )
+    finally:
+        conn.close()
+
+    statements = []
+    for _ in range(2):
+        conn = db.connect(db_path)
+        conn.set_trace_callback(statements.append)
+        try:
+            db.init_db(conn)
+        finally:
+            conn.close()
+
+    assert [sql for sql in statements if sql.startswith("ANALYZE")] == ["ANALYZE observations"]
+
+
+def test_location_migration_logs_rows_collapsed_onto_one_second(tmp_path, caplog):
+    db_path = str(tmp_path / "legacy.sqlite")
+    create_legacy_db(db_path)
+    legacy = sqlite3.connect(db_path)
+    legacy.execute(
+        """
+        INSERT INTO travel_times (origin, destination, duration_seconds, distance_meters, observed_at)
+        VALUES ('Golden, CO', 'Frisco, CO', 3650, NULL, '2024-01-01T06:00:00.5+00:00')
+        """
+    )
+    legacy.commit()
+    legacy.close()
+
+    conn = db.connect(db_path)
+    try:
+        with caplog.at_level("WARNING", logger="maps_scraper.db"):
+            db.init_db(conn)
+        durations = [row[0] for row in conn.execute(
+            "SELECT duration_seconds FROM observations ORDER BY observed_epoch"
+        )]
+    finally:
+        conn.close()
+
+    assert durations == [3650, 4000]
+    assert "collapsed 1 of 3 travel_times rows" in caplog.text
@@ -0,0 +1,153 @@
+import math
+import threading
+
+import pytest
+
+from maps_scraper import db, departure
+
+# Monday local hour (America/Denver, UTC-7 in January) -> typical duration.
+MONDAY_DURATIONS = {12: 4000, 13: 4400, 14: 3000, 15: 3600}
+MONDAYS = ("2024-01-01", "2024-01-08", "2024-01-15")
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = db.connect(str(tmp_path / "travel.sqlite"))
+    db.init_db(conn)
+    db.insert_travel_times(
+        conn,
+        [
+            ("Golden, CO", "Frisco, CO", duration, None, f"{day}T{hour + 7:02d}:00:00+00:00")
+            for day in MONDAYS
+            for hour, duration in MONDAY_DURATIONS.items()
+        ],
+    )
+    yield conn
+    conn.close()
+
+
+def plan(conn, at, **kwargs):
+    now = departure.parse_departure_time(at, db.load_timezone(db.DEFAULT_TIMEZONE))
+    return departure.best_departure(conn, "Golden, CO", "Frisco, CO", now, **kwargs)
+
+
+def test_ranks_windows_from_hour_profile(conn):
+    result = plan(conn, "2024-01-22T12:30", horizon_hours=3, step_minutes=30, limit=3)
+
+    assert result["live_ratio"] == 1.0
+    assert result["live_observed_at"] is None
+    assert result["leave_now_seconds"] == 4000
+    assert [
+        (window["rank"], window["depart_at"], window["expected_seconds"], window["saves_seconds"])
+        for window in result["windows"]
+    ] == [
+        (1, "2024-01-22T14:30:00-07:00", 3000, 1000),
+        (2, "2024-01-22T15:00:00-07:00", 3300, 700),
+        (3, "2024-01-22T15:30:00-07:00", 3600, 400),
+    ]
+    assert result["windows"][0]["depart_until"] == "2024-01-22T15:00:00-07:00"
+    assert result["windows"][0]["samples"] == 3
+
+
+def test_live_observation_scales_near_windows(conn):
+    db.insert_travel_times(
+        conn, [("Golden, CO", "Frisco, CO", 6000, None, "2024-01-22T19:00:00+00:00")]
+    )
+
+    result = plan(conn, "2024-01-22T12:30", horizon_hours=3, step_minutes=30, limit=1)
+
+    assert result["live_ratio"] == 1.5
+    assert result["live_observed_at"] == "2024-01-22T12:00:00-07:00"
+    assert result["leave_now_seconds"] == round(4000 * (1 + 0.5 * math.exp(-0.25)))
+    assert result["windows"][0]["depart_at"] == "2024-01-22T14:30:00-07:00"
+    assert result["windows"][0]["expected_seconds"] == round(
+        3000 * (1 + 0.5 * math.exp(-1.25))
+    )
+
+
+def test_index_tops_up_series_when_revision_moves(conn):
+    index = departure.DepartureIndex()
+    series = index.series(conn, "Golden, CO", "Frisco, CO")
+    assert list(series.durations) == list(MONDAY_DURATIONS.values())
+
+    db.insert_travel_times(
+        conn, [("Golden, CO", "Frisco, CO", 5000, None, "2024-01-22T20:00:00+00:00")]
+    )
+
+    refreshed = index.series(conn, "Golden, CO", "Frisco, CO")
+    assert list(refreshed.durations) == [5000]
+    assert refreshed.revision == db.data_revision(conn)
+    assert refreshed.counts[13] == 4
+    # Readers still holding the old snapshot see it unchanged.
+    assert list(series.durations) == list(MONDAY_DURATIONS.values())
+    assert series.counts[13] == 3
+    assert index.series(conn, "Golden, CO", "Frisco, CO") is refreshed
+
+
+def test_index_serves_concurrent_readers_while_revision_moves(conn, tmp_path):
+    index = departure.DepartureIndex()
+    writing = threading.Event()
+    writing.set()
+    errors = []
+
+    def read():
+        reader = db.connect_readonly(str(tmp_path / "travel.sqlite"))
+        try:
+            while writing.is_set():
+                series = index.series(reader, "Golden, CO", "Frisco, CO")
+                held = (list(series.epochs), list(series.durations), list(series.p50))
+                departure.best_departure(
+                    reader, "Golden, CO", "Frisco, CO", 1705953600, index=index
+                )
+                # Another reader may have refreshed the pair meanwhile; the
+                # snapshot this one holds must not have moved under it.
+                assert (list(series.epochs), list(series.durations), list(series.p50)) == held
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            reader.close()
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for minute in range(60):
+            db.insert_travel_times(
+                conn,
+                [
+                    (
+                        "Golden, CO",
+                        "Frisco, CO",
+                        4000 + minute,
+                        None,
+                        f"2024-01-22T19:{minute:02d}:00+00:00",
+                    )
+                ],
+            )
+    finally:
+        writing.clear()
+        for reader in readers:
+            reader.join()
+
+    assert errors == []
+    final = index.series(conn, "Golden, CO", "Frisco, CO")
+    assert final.revision == db.data_revision(conn)
+    assert final.durations[-1] == 4059
+
+
+def test_unknown_pair_has_no_windows_and_is_not_cached(conn):
+    index = departure.DepartureIndex()
+    index.series(conn, "Golden, CO", "Frisco, CO")
+
+    result = departure.best_departure(
+        conn, "Golden, CO", "Vail, CO", 1704139200, index=index
+    )
+
+    assert result["windows"] == []
+    assert result["leave_now_seconds"] is None
+    assert list(index._pairs) == [("Golden, CO", "Frisco, CO")]
+
+
+def test_departure_time_outside_datetime_range_is_rejected():
+    with pytest.raises(ValueError):
+        departure.parse_departure_time("9999-12-31T23:00", db.load_timezone(db.DEFAULT_TIMEZONE))
@@ -0,0 +1,89 @@
+import json
+import struct
+
+from maps_scraper import archive, db, export
+
+
+def test_encode_day_series_round_trips_columns():
+    series = [(1704207600, 3600, -420), (1704211200, 3900, -420), (1704211260, 70000, -360)]
+
+    encoded = export.encode_day_series(series)
+
+    magic, version, _, count, base_minute = export.SERIES_HEADER.unpack_from(encoded)
+    assert (magic, version, count, base_minute) == (b"MDT1", 1, 3, 1704207600 // 60)
+    body = encoded[export.SERIES_HEADER.size :]
+    assert struct.unpack("<3H3H3h", body) == (0, 60, 1, 3600, 3900, 0xFFFF, -420, -420, -360)
+
+
+def test_local_iso_matches_sql(tmp_path):
+    conn = db.connect(str(tmp_path / "travel.sqlite"))
+    try:
+        for epoch, offset in [(1704207600, -420), (1719835200, -360), (0, 330)]:
+            expected = conn.execute(
+                f"SELECT {db.local_iso_sql(':epoch', ':offset')}",
+                {"epoch": epoch, "offset": offset},
+            ).fetchone()[0]
+            assert db.local_iso(epoch, offset) == expected
+    finally:
+        conn.close()
+
+
+def test_export_all_streams_hot_and_archived_rows(tmp_path):
+    db_path = str(tmp_path / "travel.sqlite")
+    conn = db.connect(db_path)
+    try:
+        db.init_db(conn)
+        db.insert_travel_times(
+            conn,
+            [
+                ("Golden, CO", "Frisco, CO", 3600, None, "2023-06-01T18:00:00+00:00"),
+                ("Golden, CO", "Frisco, CO", 3700, None, "2024-01-15T18:00:00+00:00"),
+                ("Golden, CO", "Frisco, CO", 3800, None, "2024-01-15T19:00:00+00:00"),
+                ("Denver, CO", "Frisco, CO", 3000, None, "2024-01-15T18:00:00+00:00"),
+            ],
+        )
+        archive.archive_old_observations(conn, archive.default_archive_dir(db_path), "2024-01-01")
+        archive.attach_archives(conn, archive.default_archive_dir(db_path), readonly=False)
+        assert export.observation_schemas(conn) == ["main", "archive_2023"]
+
+        origins = [{"id": "golden-co", "label": "Golden, CO", "destinations": ["frisco-co"]}]
+        targets = export.export_targets(origins, [{"id": "frisco-co", "label": "Frisco, CO"}])
+        files = dict(export.export_all(conn, targets, [2023, 2024]))
+    finally:
+        conn.close()
+
+    assert sorted(files) == [
+        "calendar/golden-co/eastbound/frisco-co/2023.json",
+        "calendar/golden-co/eastbound/frisco-co/2024.json",
+        "calendar/golden-co/westbound/frisco-co/2023.json",
+        "calendar/golden-co/westbound/frisco-co/2024.json",
+        "day/golden-co/westbound/frisco-co/2023-06-01.json",
+        "day/golden-co/westbound/frisco-co/2024-01-15.json",
+        "profile/golden-co/eastbound/frisco-co.json",
+        "profile/golden-co/westbound/frisco-co.json",
+    ]
+    assert json.loads(files["calendar/golden-co/eastbound/frisco-co/2024.json"])["data"] == {}
+    day = json.loads(files["day/golden-co/westbound/frisco-co/2024-01-15.json"])
+    assert day["data"] == [
+        {"observed_at": "2024-01-15T11:00:00-07:00", "duration_seconds": 3700},
+        {"observed_at": "2024-01-15T12:00:00-07:00", "duration_seconds": 3800},
+    ]
+
+
+def test_small_incremental_exports_skip_the_process_pool():
+    targets = export.export_targets(
+        [{"id": "golden-co", "label": "Golden, CO", "destinations": ["frisco-co", "vail-co"]}],
+        [{"id": "frisco-co", "label": "Frisco, CO"}, {"id": "vail-co", "label": "Vail, CO"}],
+    )
+    changed = {("Golden, CO", "westbound", "Frisco, CO"): {"2024-01-02"}}
+
+    tasks = export.export_tasks(targets, changed)
+
+    assert [(task[1].trip, task[2]) for task in tasks] == [
+        (("Golden, CO", "Frisco, CO"), ["2024-01-02"])
+    ]
+    assert not export.parallel_worthwhile(tasks, jobs=4)
+    assert not export.parallel_worthwhile(tasks * 2, jobs=4)
+    assert export.parallel_worthwhile(tasks * export.PARALLEL_MIN_CHANGED_DAYS, jobs=4)
+    assert export.parallel_worthwhile(export.export_tasks(targets, None), jobs=4)
+    assert not export.parallel_worthwhile(export.export_tasks(targets, None), jobs=1)
@@ -0,0 +1,92 @@
+import pytest
+
+from maps_scraper.scheduler import SlotScheduler, call_with_backoff, run_scheduled
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_slots_align_to_wall_clock_without_drift():
+    clock = FakeClock(1000.0)
+    scheduler = SlotScheduler(60, clock=clock, sleep=clock.sleep)
+    started = []
+
+    def task():
+        started.append(clock.now)
+        clock.now += 17
+
+    run_scheduled(lambda: task, scheduler, max_slots=4)
+
+    assert started == [1000.0, 1020.0, 1080.0, 1140.0]
+
+
+def test_jitter_stays_inside_slot():
+    clock = FakeClock(0.0)
+    scheduler = SlotScheduler(60, jitter_seconds=10, clock=clock, sleep=clock.sleep)
+    started = []
+
+    def task():
+        started.append(clock.now)
+
+    run_scheduled(lambda: task, scheduler, max_slots=5)
+
+    assert [int(value // 60) for value in started] == [0, 1, 2, 3, 4]
+    assert all(value % 60 < 10 for value in started)
+
+
+@pytest.mark.parametrize(
+    "policy, expected",
+    [("skip", [0.0, 300.0, 360.0]), ("catch_up", [0.0, 250.0, 300.0])],
+)
+def test_missed_slot_policy(policy, expected):
+    clock = FakeClock(0.0)
+    scheduler = SlotScheduler(60, missed_slots=policy, clock=clock, sleep=clock.sleep)
+    started = []
+
+    def task():
+        started.append(clock.now)
+        if len(started) == 1:
+            clock.now += 250
+
+    run_scheduled(lambda: task, scheduler, max_slots=3)
+
+    assert started == expected
+
+
+def test_backoff_retries_until_success():
+    clock = FakeClock(0.0)
+    attempts = []
+
+    def flaky():
+        attempts.append(clock.now)
+        if len(attempts) < 3:
+            raise RuntimeError("OVER_QUERY_LIMIT")
+        return "ok"
+
+    assert call_with_backoff(flaky, 60, clock=clock, sleep=clock.sleep) == "ok"
+    assert clock.sleeps == [1.0, 2.0]
+
+
+def test_backoff_gives_up_at_deadline_and_loop_keeps_running():
+    clock = FakeClock(0.0)
+    scheduler = SlotScheduler(60, clock=clock, sleep=clock.sleep)
+    calls = []
+
+    def task():
+        calls.append(clock.now)
+        if clock.now < 60:
+            raise RuntimeError("API error: UNKNOWN_ERROR")
+
+    run_scheduled(lambda: task, scheduler, base_delay_seconds=10, max_slots=2)
+
+    assert calls == [0.0, 10.0, 30.0, 60.0]
@@ -1,4 +1,11 @@
-from datetime import datetime, timezone
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
 
 import maps_scraper.scraper as scraper
 
@@ -55,22 +62,80 @@ def test_fetch_travel_times_parses_response(monkeypatch):
     assert [r.distance_meters for r in results] == [10000, 12000]
 
 
+def make_matrix_payload(origins, destinations, base=3600):
+    return {
+        "status": "OK",
+        "rows": [
+            {
+                "elements": [
+                    {
+                        "status": "OK",
+                        "duration_in_traffic": {"value": base + 100 * i + j},
+                        "distance": {"value": 10000},
+                    }
+                    for j, _ in enumerate(destinations)
+                ]
+            }
+            for i, _ in enumerate(origins)
+        ],
+    }
+
+
+def test_plan_matrix_chunks_respects_element_limits():
+    origins = [f"o{i}" for i in range(30)]
+    destinations = [f"d{i}" for i in range(30)]
+
+    chunks = scraper.plan_matrix_chunks(origins, destinations)
+
+    for origin_chunk, destination_chunk in chunks:
+        assert len(origin_chunk) <= scraper.MAX_ORIGINS_PER_REQUEST
+        assert len(destination_chunk) <= scraper.MAX_DESTINATIONS_PER_REQUEST
+        assert len(origin_chunk) * len(destination_chunk) <= scraper.MAX_ELEMENTS_PER_REQUEST
+    pairs = {(o, d) for oc, dc in chunks for o in oc for d in dc}
+    assert len(pairs) == 30 * 30
+    assert scraper.plan_matrix_chunks(["o"], destinations[:20]) == [(["o"], destinations[:20])]
+    assert len(scraper.plan_matrix_chunks(destinations[:20], ["o"])) == 1
+
+
+def test_fetch_travel_matrix_maps_rows_to_origins(monkeypatch):
+    calls = []
+
+    def fake_get(url, params, timeout):
+        origins = params["origins"].split("|")
+        destinations = params["destinations"].split("|")
+        calls.append((origins, destinations))
+        return FakeResponse(make_matrix_payload(origins, destinations))
+
+    monkeypatch.setattr(scraper.requests, "get", fake_get)
+
+    results = scraper.fetch_travel_matrix(
+        "key", ["Frisco, CO", "Winter Park, CO"], ["Golden, CO"]
+    )
+
+    assert calls == [(["Frisco, CO", "Winter Park, CO"], ["Golden, CO"])]
+    assert [(origin, r.destination, r.duration_seconds) for origin, r in results] == [
+        ("Frisco, CO", "Golden, CO", 3600),
+        ("Winter Park, CO", "Golden, CO", 3700),
+    ]
+
+
 def test_scrape_once_inserts_rows(tmp_path, monkeypatch):
     db_path = tmp_path / "travel.sqlite"
     observed_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    calls = []
 
-    def fake_fetch(*args, **kwargs):
-        return [
-            scraper.TravelTime("Frisco, CO", 3600, 10000),
-            scraper.TravelTime("Winter Park, CO", 5400, 12000),
-        ]
+    def fake_get(url, params, timeout):
+        origins = params["origins"].split("|")
+        destinations = params["destinations"].split("|")
+        calls.append((origins, destinations))
+        return FakeResponse(make_matrix_payload(origins, destinations))
 
-    monkeypatch.setattr(scraper, "fetch_travel_times", fake_fetch)
+    monkeypatch.setattr(scraper.requests, "get", fake_get)
 
     scraper.scrape_once(
         api_key="key",
         db_path=str(db_path),
-        origin="Golden, CO",
+        origins=["Golden, CO"],
         destinations=["Frisco, CO", "Winter Park, CO"],
         observed_at=observed_at,
     )
@@ -79,13 +144,177 @@ def test_scrape_once_inserts_rows(tmp_path, monkeypatch):
     try:
         rows = conn.execute(
             "SELECT origin, destination, duration_seconds, distance_meters, observed_at FROM travel_times"
+            " ORDER BY origin, destination"
         ).fetchall()
     finally:
         conn.close()
 
-    assert len(rows) == 2
-    assert rows[0][0] == "Golden, CO"
-    assert rows[0][1] == "Frisco, CO"
-    assert rows[0][2] == 3600
-    assert rows[0][3] == 10000
-    assert rows[0][4] == observed_at.isoformat()
+    assert len(calls) == 2
+    assert len(rows) == 4
+    assert rows[1][0] == "Golden, CO"
+    assert rows[1][1] == "Frisco, CO"
+    assert rows[1][2] == 3600
+    assert rows[1][3] == 10000
+    assert rows[1][4] == observed_at.isoformat()
+    assert rows[0][:3] == ("Frisco, CO", "Golden, CO", 3600)
+    assert rows[3][:3] == ("Winter Park, CO", "Golden, CO", 3700)
+
+
+def test_scrape_keeps_ok_elements_and_requeues_failed_pairs(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "travel.sqlite")
+    statuses = {("Golden, CO", "Vail, CO"): ["UNKNOWN_ERROR", "OK"]}
+    statuses[("Golden, CO", "Loveland Pass, CO")] = ["ZERO_RESULTS"] * 2
+    calls = []
+
+    def fake_get(url, params, timeout):
+        origins = params["origins"].split("|")
+        destinations = params["destinations"].split("|")
+        calls.append((origins, destinations))
+        payload = make_matrix_payload(origins, destinations)
+        for row, origin in zip(payload["rows"], origins):
+            for element, destination in zip(row["elements"], destinations):
+                queued = statuses.get((origin, destination))
+                if queued:
+                    element["status"] = queued.pop(0)
+        return FakeResponse(payload)
+
+    monkeypatch.setattr(scraper.requests, "get", fake_get)
+    destinations = ["Frisco, CO", "Vail, CO", "Loveland Pass, CO"]
+
+    with scraper.db.TravelTimeWriter(db_path) as writer:
+        attempt = scraper.scrape_attempt(
+            "key", db_path, scraper.snapshot_matrices(["Golden, CO"], destinations), writer=writer
+        )
+        with pytest.raises(scraper.PartialScrapeError) as excinfo:
+            attempt()
+        attempt()
+
+    conn = scraper.db.connect(db_path)
+    try:
+        stored = conn.execute(
+            "SELECT origin, destination FROM travel_times"
+        ).fetchall()
+        failures = conn.execute(
+            "SELECT origin, destination, status, failure_count FROM element_failures"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    assert [(f.destination, f.status) for f in excinfo.value.failures] == [
+        ("Vail, CO", "UNKNOWN_ERROR")
+    ]
+    assert calls[2:] == [(["Golden, CO"], ["Vail, CO"])]
+    assert len(stored) == 5
+    assert ("Golden, CO", "Vail, CO") in stored
+    assert failures == [("Golden, CO", "Loveland Pass, CO", "ZERO_RESULTS", 1)]
+
+
+def test_plan_pair_matrices_groups_by_shared_endpoint():
+    assert scraper.plan_pair_matrices(
+        [("Frisco, CO", "Golden, CO"), ("Vail, CO", "Golden, CO"), ("Golden, CO", "Vail, CO")]
+    ) == [(["Frisco, CO", "Vail, CO"], ["Golden, CO"]), (["Golden, CO"], ["Vail, CO"])]
+
+
+@pytest.fixture
+def stub_matrix_server():
+    delay_seconds = 0.2
+    connections = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            connections.add(self.client_address)
+            params = parse_qs(urlparse(self.path).query)
+            origins = params["origins"][0].split("|")
+            destinations = params["destinations"][0].split("|")
+            time.sleep(delay_seconds)
+            body = json.dumps(make_matrix_payload(origins, destinations)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/json", delay_seconds, connections
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_concurrent_fetcher_overlaps_requests(stub_matrix_server):
+    url, delay_seconds, connections = stub_matrix_server
+    origins = [f"Origin {i}" for i in range(8)]
+    destinations = [f"Destination {i}" for i in range(50)]
+
+    with scraper.ConcurrentFetcher(
+        "key", max_in_flight=4, rate_per_second=100, url=url
+    ) as fetcher:
+        started = time.monotonic()
+        results = fetcher.fetch_matrix(origins, destinations)
+        elapsed = time.monotonic() - started
+        fetcher.fetch_matrix(origins, destinations)
+
+    assert len(scraper.plan_matrix_chunks(origins, destinations)) == 4
+    assert elapsed < delay_seconds * 2
+    assert len(results) == 8 * 50
+    assert results[0][0] == "Origin 0"
+    assert results[0][1].destination == "Destination 0"
+    assert results[-1][0] == "Origin 7"
+    assert results[-1][1].duration_seconds == 3600 + 300 + 24
+    assert len(connections) <= 4
+
+
+def test_token_bucket_limits_rate():
+    now = [0.0]
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    bucket = scraper.TokenBucket(2.0, capacity=2, clock=lambda: now[0], sleep=fake_sleep)
+    for _ in range(6):
+        bucket.acquire()
+
+    assert sleeps == [pytest.approx(0.5)] * 4
+    assert now[0] == pytest.approx(2.0)
+
+
+def test_adaptive_sampler_spends_budget_on_volatile_pairs(tmp_path):
+    db_path = str(tmp_path / "travel.sqlite")
+    start = datetime(2024, 1, 6, 16, tzinfo=timezone.utc)
+    rows = []
+    for week in range(3):
+        observed_at = (start + timedelta(weeks=week)).isoformat()
+        rows.append(("Golden, CO", "Frisco, CO", 3600, None, observed_at))
+        rows.append(("Golden, CO", "Vail, CO", 4000 + 1500 * week, None, observed_at))
+    with scraper.db.TravelTimeWriter(db_path) as writer:
+        writer.write_snapshot(rows)
+        pairs = [
+            ("Golden, CO", "Frisco, CO"),
+            ("Golden, CO", "Vail, CO"),
+            ("Golden, CO", "Winter Park, CO"),
+        ]
+        sampler = scraper.AdaptiveSampler(
+            pairs, budget_per_hour=6, min_interval_seconds=300, max_interval_seconds=3600
+        )
+        now = (start + timedelta(weeks=3)).timestamp()
+        sampler.refresh(writer.conn, now)
+        _, _, hour, weekday, _ = scraper.db.epoch_local_columns(int(now), writer.tz)
+
+    intervals = sampler.intervals(weekday, hour)
+    assert intervals[("Golden, CO", "Frisco, CO")] == 3600
+    assert intervals[("Golden, CO", "Vail, CO")] == pytest.approx(1200, abs=1)
+    assert intervals[("Golden, CO", "Winter Park, CO")] == intervals[("Golden, CO", "Vail, CO")]
+
+    assert sampler.take_due(now, weekday, hour) == pairs
+    assert sampler.take_due(now + 900, weekday, hour) == []
+    assert sampler.take_due(now + 1201, weekday, hour) == pairs[1:]
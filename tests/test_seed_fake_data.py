@@ -0,0 +1,38 @@
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+spec = importlib.util.spec_from_file_location(
+    "seed_fake_data", REPO_ROOT / "scripts" / "seed_fake_data.py"
+)
+seed_fake_data = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(seed_fake_data)
+
+
+def generate(seed):
+    return [
+        row
+        for batch in seed_fake_data.generate_rows(
+            np.random.default_rng(seed),
+            [("Golden, CO", "Frisco, CO"), ("Frisco, CO", "Golden, CO")],
+            1719792000,
+            1719792000 + 6 * 3600,
+            1800,
+            5,
+            "America/Denver",
+        )
+        for row in batch
+    ]
+
+
+def test_generate_rows_is_seed_reproducible():
+    rows = generate(7)
+
+    assert rows == generate(7)
+    assert rows != generate(8)
+    assert len(rows) == 12 * 2
+    assert rows[0][:2] == ("Golden, CO", "Frisco, CO")
+    assert rows[0][4:] == ("2024-07-01T00:00:00+00:00", 1719792000, "2024-06-30", 2024, 18, 6, -360)
+    assert all(row[2] >= 1200 for row in rows)
@@ -0,0 +1,37 @@
+from datetime import date
+
+import pytest
+
+from maps_scraper import serialize
+
+PAYLOAD = {
+    "origin": "Golden, CO",
+    "destination": "Cañon City, CO",
+    "date": "2024-01-02",
+    "data": [{"observed_at": "2024-01-02T11:00:00-07:00", "duration_seconds": 3600}],
+    "empty": {},
+}
+
+
+def test_stdlib_backend_is_compact_utf8():
+    assert serialize.dumps_stdlib({"a": [1, 2], "b": "ñ"}) == '{"a":[1,2],"b":"ñ"}'.encode()
+
+
+def test_orjson_backend_matches_stdlib_bytes():
+    pytest.importorskip("orjson")
+    assert serialize.dumps_orjson(PAYLOAD) == serialize.dumps_stdlib(PAYLOAD)
+
+
+def test_backend_can_be_chosen_by_name(monkeypatch):
+    monkeypatch.setenv("MAPS_SCRAPER_JSON_BACKEND", "json")
+    assert serialize.get_serializer() is serialize.dumps_stdlib
+    with pytest.raises(ValueError):
+        serialize.get_serializer("yaml")
+
+
+@pytest.mark.parametrize("backend", sorted(serialize.SERIALIZERS))
+def test_backends_honour_sort_keys_and_default(backend):
+    dumps = serialize.SERIALIZERS[backend]
+    payload = {"b": date(2024, 1, 2), "a": 1}
+
+    assert dumps(payload, sort_keys=True, default=str) == b'{"a":1,"b":"2024-01-02"}'
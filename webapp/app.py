@@ -1,109 +1,258 @@
+import functools
+import hashlib
 import os
+import queue
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date as date_type
 from pathlib import Path
 
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, g, jsonify, render_template, request
+from flask.json.provider import DefaultJSONProvider
+
+from maps_scraper import archive, db, departure, serialize
+from maps_scraper.config import load_origins
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 512) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[bytes, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> tuple[bytes, str] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, entry: tuple[bytes, str]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class ConnectionPool:
+    """Bounded pool of read-only connections shared by all request threads."""
+
+    def __init__(self, open_connection, max_idle: int = 8) -> None:
+        self._open = open_connection
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(max_idle)
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+class CompactJSONProvider(DefaultJSONProvider):
+    """Route jsonify through the shared serializer (orjson when installed)."""
+
+    def __init__(self, app: Flask) -> None:
+        super().__init__(app)
+        self._dumps = serialize.get_serializer()
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs.get("indent") is not None:
+            # Debug-mode pretty printing stays on the stdlib path.
+            return super().dumps(obj, **kwargs)
+        return self._dumps(
+            obj,
+            sort_keys=kwargs.get("sort_keys", self.sort_keys),
+            default=kwargs.get("default", self.default),
+        ).decode("utf-8")
 
 
 def create_app() -> Flask:
     app = Flask(__name__)
+    app.json = CompactJSONProvider(app)
     db_path = os.getenv("MAPS_SCRAPER_DB", "./data/travel_times.sqlite")
-    origin_city = os.getenv("MAPS_SCRAPER_ORIGIN", "Golden, CO")
+    archive_dir = os.getenv(
+        "MAPS_SCRAPER_ARCHIVE_DIR", str(archive.default_archive_dir(db_path))
+    )
+    origins = load_origins()
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    setup_conn = db.connect(db_path)
+    try:
+        db.init_db(setup_conn, os.getenv("MAPS_SCRAPER_TIMEZONE"))
+    finally:
+        setup_conn.close()
 
-    def connect() -> sqlite3.Connection:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
+    cache = ResponseCache(int(os.getenv("MAPS_SCRAPER_RESPONSE_CACHE_SIZE", "512")))
+    departures = departure.DepartureIndex()
+
+    def open_connection() -> sqlite3.Connection:
+        conn = db.connect_readonly(db_path)
+        archive.attach_archives(conn, archive_dir)
         return conn
 
+    pool = ConnectionPool(
+        open_connection, int(os.getenv("MAPS_SCRAPER_DB_POOL_SIZE", "8"))
+    )
+
+    def connect() -> sqlite3.Connection:
+        # One pooled connection per request, returned on teardown.
+        if "conn" not in g:
+            conn = pool.acquire()
+            # Archiving can add a year file while pooled connections live.
+            archive.sync_archives(conn, archive_dir)
+            g.conn = conn
+        return g.conn
+
+    @app.teardown_appcontext
+    def release_connection(exc: BaseException | None) -> None:
+        conn = g.pop("conn", None)
+        if conn is not None:
+            pool.release(conn)
+
     def normalize_direction(value: str) -> str:
         if value == "eastbound":
             return "eastbound"
         return "westbound"
 
-    def resolve_trip(direction: str, destination: str) -> tuple[str, str]:
+    def resolve_origin() -> str | None:
+        origin = request.args.get("origin") or origins[0]
+        return origin if origin in origins else None
+
+    def resolve_trip(origin: str, direction: str, destination: str) -> tuple[str, str]:
         if direction == "eastbound":
-            return destination, origin_city
-        return origin_city, destination
+            return destination, origin
+        return origin, destination
+
+    def bounded_int(name: str, default: int, bounds: tuple[int, int]) -> int | None:
+        value = request.args.get(name, "")
+        if not value:
+            return default
+        if not (value.isascii() and value.isdigit()):
+            return None
+        return int(value) if bounds[0] <= int(value) <= bounds[1] else None
+
+    def cached_json(view):
+        @functools.wraps(view)
+        def wrapper():
+            version = db.data_revision(connect())
+            key = (version, request.path, tuple(sorted(request.args.items(multi=True))))
+            entry = cache.get(key)
+            if entry is None:
+                result = view()
+                if isinstance(result, tuple):
+                    return result
+                body = result.get_data()
+                entry = (body, hashlib.sha256(body).hexdigest())
+                cache.put(key, entry)
+
+            response = app.response_class(entry[0], mimetype="application/json")
+            response.set_etag(entry[1])
+            response.cache_control.no_cache = True
+            return response.make_conditional(request)
+
+        return wrapper
 
     @app.route("/")
     def index():
         conn = connect()
-        try:
-            destinations = [
-                row[0]
-                for row in conn.execute(
-                    """
-                    SELECT DISTINCT destination
-                    FROM travel_times
-                    WHERE origin = ?
-                    ORDER BY destination
-                    """,
-                    (origin_city,),
-                ).fetchall()
-            ]
-        finally:
-            conn.close()
+        destinations = [
+            row[0]
+            for row in conn.execute(
+                f"""
+                SELECT DISTINCT destination
+                FROM travel_times
+                WHERE origin IN ({", ".join("?" for _ in origins)})
+                ORDER BY destination
+                """,
+                origins,
+            ).fetchall()
+        ]
 
-        return render_template("index.html", destinations=destinations, origin=origin_city)
+        return render_template("index.html", destinations=destinations, origins=origins)
 
     @app.route("/api/calendar")
+    @cached_json
     def calendar():
         destination = request.args.get("destination", "")
         year = request.args.get("year", "")
         direction = normalize_direction(request.args.get("direction", "westbound"))
+        origin = resolve_origin()
         if not destination or not year:
             return jsonify({"error": "destination and year are required"}), 400
-        origin_value, destination_value = resolve_trip(direction, destination)
+        if not (year.isascii() and year.isdigit()):
+            return jsonify({"error": "year must be numeric"}), 400
+        if origin is None:
+            return jsonify({"error": "unknown origin"}), 400
+        origin_value, destination_value = resolve_trip(origin, direction, destination)
 
         conn = connect()
-        try:
-            rows = conn.execute(
-                """
-                SELECT date(datetime(observed_at, '-7 hours')) AS day,
-                       MAX(duration_seconds) AS max_duration
-                FROM travel_times
-                WHERE origin = ?
-                  AND destination = ?
-                  AND strftime('%Y', datetime(observed_at, '-7 hours')) = ?
-                GROUP BY day
-                ORDER BY day
-                """,
-                (origin_value, destination_value, year),
-            ).fetchall()
-        finally:
-            conn.close()
+        rows = conn.execute(
+            """
+            SELECT local_date AS day, max_duration
+            FROM daily_summary
+            WHERE origin = ?
+              AND destination = ?
+              AND local_date >= ?
+              AND local_date < ?
+            ORDER BY local_date
+            """,
+            (
+                origin_value,
+                destination_value,
+                f"{int(year):04d}-01-01",
+                f"{int(year) + 1:04d}-01-01",
+            ),
+        ).fetchall()
 
         data = {row["day"]: row["max_duration"] for row in rows}
         return jsonify(
-            {"destination": destination, "year": year, "direction": direction, "data": data}
+            {
+                "origin": origin,
+                "destination": destination,
+                "year": year,
+                "direction": direction,
+                "data": data,
+            }
         )
 
     @app.route("/api/day")
+    @cached_json
     def day():
         destination = request.args.get("destination", "")
         date = request.args.get("date", "")
         direction = normalize_direction(request.args.get("direction", "westbound"))
+        origin = resolve_origin()
         if not destination or not date:
             return jsonify({"error": "destination and date are required"}), 400
-        origin_value, destination_value = resolve_trip(direction, destination)
+        try:
+            date = date_type.fromisoformat(date).isoformat()
+        except ValueError:
+            return jsonify({"error": "date must be YYYY-MM-DD"}), 400
+        if origin is None:
+            return jsonify({"error": "unknown origin"}), 400
+        origin_value, destination_value = resolve_trip(origin, direction, destination)
 
         conn = connect()
-        try:
-            rows = conn.execute(
-                """
-                SELECT strftime('%Y-%m-%dT%H:%M:%S', datetime(observed_at, '-7 hours')) || '-07:00' AS observed_at,
-                       duration_seconds
-                FROM travel_times
-                WHERE origin = ?
-                  AND destination = ?
-                  AND date(datetime(observed_at, '-7 hours')) = ?
-                ORDER BY observed_at
-                """,
-                (origin_value, destination_value, date),
-            ).fetchall()
-        finally:
-            conn.close()
+        rows = conn.execute(
+            f"""
+            SELECT {db.local_iso_sql()} AS observed_at,
+                   duration_seconds
+            FROM travel_times
+            WHERE origin = ?
+              AND destination = ?
+              AND local_date = ?
+            ORDER BY observed_epoch
+            """,
+            (origin_value, destination_value, date),
+        ).fetchall()
 
         data = [
             {
@@ -113,29 +262,113 @@ def create_app() -> Flask:
             for row in rows
         ]
         return jsonify(
-            {"destination": destination, "date": date, "direction": direction, "data": data}
+            {
+                "origin": origin,
+                "destination": destination,
+                "date": date,
+                "direction": direction,
+                "data": data,
+            }
+        )
+
+    @app.route("/api/profile")
+    @cached_json
+    def profile():
+        destination = request.args.get("destination", "")
+        direction = normalize_direction(request.args.get("direction", "westbound"))
+        origin = resolve_origin()
+        if not destination:
+            return jsonify({"error": "destination is required"}), 400
+        if origin is None:
+            return jsonify({"error": "unknown origin"}), 400
+        origin_value, destination_value = resolve_trip(origin, direction, destination)
+
+        return jsonify(
+            {
+                "origin": origin,
+                "destination": destination,
+                "direction": direction,
+                "data": db.hour_profile(connect(), origin_value, destination_value),
+            }
+        )
+
+    @app.route("/api/best-departure")
+    def best_departure():
+        # Not cached: the answer moves with the clock, and the in-memory
+        # series already makes it a handful of array lookups.
+        destination = request.args.get("destination", "")
+        direction = normalize_direction(request.args.get("direction", "westbound"))
+        origin = resolve_origin()
+        hours = bounded_int(
+            "hours", departure.DEFAULT_HORIZON_HOURS, departure.HORIZON_HOURS_RANGE
+        )
+        step = bounded_int(
+            "step", departure.DEFAULT_STEP_MINUTES, departure.STEP_MINUTES_RANGE
+        )
+        limit = bounded_int("limit", departure.DEFAULT_LIMIT, departure.LIMIT_RANGE)
+        if not destination:
+            return jsonify({"error": "destination is required"}), 400
+        if origin is None:
+            return jsonify({"error": "unknown origin"}), 400
+        if hours is None or step is None or limit is None:
+            return (
+                jsonify({"error": "hours (1-24), step (5-60) and limit (1-100) are integers"}),
+                400,
+            )
+        if request.args.get("at"):
+            try:
+                now = departure.parse_departure_time(
+                    request.args["at"],
+                    db.load_timezone(db.get_timezone_name(connect())),
+                )
+            except ValueError:
+                return jsonify({"error": "at must be an ISO 8601 timestamp (1971-9998)"}), 400
+        else:
+            now = int(time.time())
+        origin_value, destination_value = resolve_trip(origin, direction, destination)
+
+        result = departure.best_departure(
+            connect(),
+            origin_value,
+            destination_value,
+            now,
+            hours,
+            step,
+            limit,
+            index=departures,
+        )
+        return jsonify(
+            {
+                "origin": origin,
+                "destination": destination,
+                "direction": direction,
+                "hours": hours,
+                "step": step,
+                **result,
+            }
         )
 
     @app.route("/api/years")
+    @cached_json
     def years():
         direction = normalize_direction(request.args.get("direction", "westbound"))
+        origin = resolve_origin()
+        if origin is None:
+            return jsonify({"error": "unknown origin"}), 400
         if direction == "eastbound":
             where_clause = "destination = ?"
         else:
             where_clause = "origin = ?"
         conn = connect()
-        try:
-            rows = conn.execute(
-                f"""
-                SELECT DISTINCT strftime('%Y', datetime(observed_at, '-7 hours')) AS year
-                FROM travel_times
-                WHERE {where_clause}
-                ORDER BY year
-                """,
-                (origin_city,),
-            ).fetchall()
-        finally:
-            conn.close()
+        rows = conn.execute(
+            f"""
+            SELECT DISTINCT local_year AS year
+            FROM travel_times
+            WHERE {where_clause}
+            ORDER BY local_year
+            """,
+            (origin,),
+        ).fetchall()
 
         years = [int(row["year"]) for row in rows if row["year"]]
         return jsonify({"years": years})
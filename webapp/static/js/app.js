@@ -15,6 +15,7 @@ const monthNames = [
 
 const weekdayLabels = ["M", "T", "W", "T", "F", "S", "S"];
 const calendarEl = document.getElementById("calendar");
+const originSelect = document.getElementById("origin-select");
 const directionSelect = document.getElementById("direction-select");
 const destinationSelect = document.getElementById("destination-select");
 const yearSelect = document.getElementById("year-select");
@@ -25,6 +26,9 @@ const chartContainer = document.getElementById("detail-chart");
 const legendMin = document.getElementById("legend-min");
 const legendMax = document.getElementById("legend-max");
 const detailModal = document.getElementById("detail-modal");
+const weekdaySelect = document.getElementById("weekday-select");
+const departureChart = document.getElementById("departure-chart");
+const departureSubtitle = document.getElementById("departure-subtitle");
 const modalClosers = detailModal.querySelectorAll("[data-modal-close]");
 const bodyDataset = document.body ? document.body.dataset : {};
 const dataSource = bodyDataset.dataSource || bodyDataset.source || "api";
@@ -32,9 +36,12 @@ const dataBase = bodyDataset.dataBase || bodyDataset.base || "";
 
 let activeDayTile = null;
 let calendarData = {};
+let profileData = [];
 let indexData = null;
+let originLookup = {};
 let destinationLookup = {};
 let directionLookup = {};
+const dayShardCache = new Map();
 
 function withDataBase(path) {
   if (!dataBase) {
@@ -65,7 +72,11 @@ async function loadIndexData() {
     return indexData;
   }
   const payload = await fetchJson(withDataBase("index.json"));
-  indexData = payload || { destinations: [], years: [], directions: [] };
+  indexData = payload || { origins: [], destinations: [], years: [], directions: [] };
+  originLookup = {};
+  (indexData.origins || []).forEach((entry) => {
+    originLookup[entry.id] = entry;
+  });
   destinationLookup = {};
   (indexData.destinations || []).forEach((entry) => {
     destinationLookup[entry.id] = entry.label;
@@ -82,6 +93,18 @@ const defaultDirections = [
   { id: "eastbound", label: "Eastbound" },
 ];
 
+function currentOrigin() {
+  return originSelect ? originSelect.value : "";
+}
+
+function currentOriginLabel() {
+  if (dataSource === "static") {
+    const entry = originLookup[currentOrigin()];
+    return entry ? entry.label : currentOrigin();
+  }
+  return currentOrigin();
+}
+
 function currentDirection() {
   if (!directionSelect) {
     return "westbound";
@@ -147,18 +170,40 @@ function colorForValue(value, min, max) {
   return `rgb(${color.r}, ${color.g}, ${color.b})`;
 }
 
+async function buildOriginOptions() {
+  if (dataSource !== "static" || !originSelect) {
+    return;
+  }
+  const payload = await loadIndexData();
+  originSelect.innerHTML = "";
+  (payload.origins || []).forEach((origin, idx) => {
+    const option = document.createElement("option");
+    option.value = origin.id;
+    option.textContent = origin.label;
+    if (idx === 0) {
+      option.selected = true;
+    }
+    originSelect.appendChild(option);
+  });
+}
+
 async function buildDestinationOptions() {
   if (dataSource !== "static") {
     return;
   }
   const payload = await loadIndexData();
-  const destinations = payload.destinations || [];
+  const origin = originLookup[currentOrigin()];
+  const allowed = origin ? new Set(origin.destinations) : null;
+  const previous = destinationSelect.value;
+  const destinations = (payload.destinations || []).filter(
+    (dest) => !allowed || allowed.has(dest.id)
+  );
   destinationSelect.innerHTML = "";
   destinations.forEach((dest, idx) => {
     const option = document.createElement("option");
     option.value = dest.id;
     option.textContent = dest.label;
-    if (idx === 0) {
+    if (dest.id === previous || (idx === 0 && !previous)) {
       option.selected = true;
     }
     destinationSelect.appendChild(option);
@@ -196,7 +241,7 @@ async function buildYearOptions() {
   } else {
     const direction = currentDirection();
     const response = await fetch(
-      `/api/years?direction=${encodeURIComponent(direction)}`
+      `/api/years?direction=${encodeURIComponent(direction)}&origin=${encodeURIComponent(currentOrigin())}`
     );
     const payload = await response.json();
     years = payload.years || [];
@@ -293,6 +338,7 @@ function applyCalendarColors() {
 }
 
 async function fetchCalendar() {
+  const origin = currentOrigin();
   const direction = currentDirection();
   const destination = destinationSelect.value;
   const year = yearSelect.value;
@@ -305,12 +351,12 @@ async function fetchCalendar() {
   if (dataSource === "static") {
     payload = await fetchJson(
       withDataBase(
-        `calendar/${encodeURIComponent(direction)}/${encodeURIComponent(destination)}/${year}.json`
+        `calendar/${encodeURIComponent(origin)}/${encodeURIComponent(direction)}/${encodeURIComponent(destination)}/${year}.json`
       )
     );
   } else {
     const response = await fetch(
-      `/api/calendar?destination=${encodeURIComponent(destination)}&year=${encodeURIComponent(year)}&direction=${encodeURIComponent(direction)}`
+      `/api/calendar?destination=${encodeURIComponent(destination)}&year=${encodeURIComponent(year)}&direction=${encodeURIComponent(direction)}&origin=${encodeURIComponent(origin)}`
     );
     payload = await response.json();
   }
@@ -338,7 +384,95 @@ function selectDay(tile, dateKey) {
   fetchDayDetail(dateKey);
 }
 
+async function fetchArrayBuffer(path) {
+  try {
+    const response = await fetch(path);
+    if (!response.ok && response.status !== 0) {
+      return null;
+    }
+    return await response.arrayBuffer();
+  } catch (error) {
+    return null;
+  }
+}
+
+function formatOffset(offsetMinutes) {
+  const sign = offsetMinutes < 0 ? "-" : "+";
+  const absolute = Math.abs(offsetMinutes);
+  return `${sign}${pad(Math.floor(absolute / 60))}:${pad(absolute % 60)}`;
+}
+
+function decodeDaySeries(buffer) {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== "MDT1" || view.getUint16(4, true) !== 1) {
+    return {};
+  }
+  const count = view.getUint32(8, true);
+  const deltas = new Uint16Array(buffer, 16, count);
+  const durations = new Uint16Array(buffer, 16 + count * 2, count);
+  const offsets = new Int16Array(buffer, 16 + count * 4, count);
+  const days = {};
+  let minute = view.getUint32(12, true);
+  for (let i = 0; i < count; i += 1) {
+    minute += deltas[i];
+    const local = new Date((minute + offsets[i]) * 60000);
+    const dateKey = `${local.getUTCFullYear()}-${pad(local.getUTCMonth() + 1)}-${pad(local.getUTCDate())}`;
+    if (!days[dateKey]) {
+      days[dateKey] = [];
+    }
+    days[dateKey].push({
+      observed_at: `${dateKey}T${pad(local.getUTCHours())}:${pad(local.getUTCMinutes())}:00${formatOffset(offsets[i])}`,
+      duration_seconds: durations[i],
+    });
+  }
+  return days;
+}
+
+async function loadDayFile(path, format, dateKey) {
+  if (format === "binary") {
+    const buffer = await fetchArrayBuffer(path);
+    return buffer ? decodeDaySeries(buffer) : null;
+  }
+  const payload = await fetchJson(path);
+  if (!payload) {
+    return null;
+  }
+  return payload.days || { [dateKey]: payload.data || [] };
+}
+
+function fetchDayFile(origin, direction, destination, key, format) {
+  const extension = format === "binary" ? "bin" : "json";
+  const path = withDataBase(
+    `day/${encodeURIComponent(origin)}/${encodeURIComponent(direction)}/${encodeURIComponent(destination)}/${key}.${extension}`
+  );
+  if (!dayShardCache.has(path)) {
+    const request = loadDayFile(path, format, key).then((days) => {
+      if (!days) {
+        dayShardCache.delete(path);
+      }
+      return days;
+    });
+    dayShardCache.set(path, request);
+  }
+  return dayShardCache.get(path);
+}
+
+async function fetchStaticDay(origin, direction, destination, dateKey) {
+  const payload = await loadIndexData();
+  const key = payload.day_layout === "monthly" ? dateKey.slice(0, 7) : dateKey;
+  const days = await fetchDayFile(
+    origin,
+    direction,
+    destination,
+    key,
+    payload.data_format || "json"
+  );
+  return { data: (days && days[dateKey]) || [] };
+}
+
 async function fetchDayDetail(dateKey) {
+  const origin = currentOrigin();
   const direction = currentDirection();
   const destination = destinationSelect.value;
   if (!destination) {
@@ -347,14 +481,10 @@ async function fetchDayDetail(dateKey) {
   }
   let payload = null;
   if (dataSource === "static") {
-    payload = await fetchJson(
-      withDataBase(
-        `day/${encodeURIComponent(direction)}/${encodeURIComponent(destination)}/${dateKey}.json`
-      )
-    );
+    payload = await fetchStaticDay(origin, direction, destination, dateKey);
   } else {
     const response = await fetch(
-      `/api/day?destination=${encodeURIComponent(destination)}&date=${encodeURIComponent(dateKey)}&direction=${encodeURIComponent(direction)}`
+      `/api/day?destination=${encodeURIComponent(destination)}&date=${encodeURIComponent(dateKey)}&direction=${encodeURIComponent(direction)}&origin=${encodeURIComponent(origin)}`
     );
     payload = await response.json();
   }
@@ -364,7 +494,7 @@ async function fetchDayDetail(dateKey) {
 function renderDayDetail(dateKey, data) {
   detailTitle.textContent = `${dateKey}`;
   detailSubtitle.textContent = data.length
-    ? `Hourly observations for ${currentDestinationLabel()} (${currentDirectionLabel()})`
+    ? `Hourly observations for ${currentDestinationLabel()} (${currentOriginLabel()}, ${currentDirectionLabel()})`
     : "No data recorded for this day.";
 
   detailMeta.textContent = `${data.length} readings`;
@@ -385,9 +515,8 @@ function renderDayDetail(dateKey, data) {
   const durationsMinutes = durationsSeconds.map((value) => value / 60);
 
   const points = data.map((entry, index) => {
-    const date = new Date(entry.observed_at);
-    const hour = date.getHours();
-    const minute = date.getMinutes();
+    const hour = parseInt(entry.observed_at.slice(11, 13), 10);
+    const minute = parseInt(entry.observed_at.slice(14, 16), 10);
     return {
       hour,
       value: entry.duration_seconds / 60,
@@ -534,36 +663,191 @@ function renderDayDetail(dateKey, data) {
   detailMeta.textContent = `${data.length} readings, ${formatDuration(min)} - ${formatDuration(max)}`;
 }
 
+async function fetchProfile() {
+  if (!departureChart) {
+    return;
+  }
+  const origin = currentOrigin();
+  const direction = currentDirection();
+  const destination = destinationSelect.value;
+  let payload = null;
+  if (destination && dataSource === "static") {
+    payload = await fetchJson(
+      withDataBase(
+        `profile/${encodeURIComponent(origin)}/${encodeURIComponent(direction)}/${encodeURIComponent(destination)}.json`
+      )
+    );
+  } else if (destination) {
+    payload = await fetchJson(
+      `/api/profile?destination=${encodeURIComponent(destination)}&direction=${encodeURIComponent(direction)}&origin=${encodeURIComponent(origin)}`
+    );
+  }
+  profileData = (payload && payload.data) || [];
+  renderDepartureChart();
+}
+
+function renderDepartureChart() {
+  const weekday = parseInt(weekdaySelect.value, 10);
+  const buckets = profileData
+    .filter((entry) => entry.weekday === weekday)
+    .sort((a, b) => a.hour - b.hour);
+  departureChart.innerHTML = "";
+  departureSubtitle.textContent = buckets.length
+    ? `Median and 90th percentile drive time to ${currentDestinationLabel()} (${currentOriginLabel()}, ${currentDirectionLabel()}) by departure hour.`
+    : "No history for this day yet.";
+  if (!buckets.length) {
+    return;
+  }
+
+  const width = departureChart.clientWidth - 32;
+  const height = 240;
+  const padding = 40;
+  const minutes = (seconds) => seconds / 60;
+  const domainMin = Math.floor(Math.min(...buckets.map((entry) => minutes(entry.p50))) / 10) * 10;
+  const domainMax = Math.ceil(Math.max(...buckets.map((entry) => minutes(entry.p90))) / 10) * 10 || 10;
+  const xScale = (hour) => padding + (hour / 23) * (width - padding * 2);
+  const yScale = (value) =>
+    height - padding - ((value - domainMin) / (domainMax - domainMin || 1)) * (height - padding * 2);
+
+  const svg = document.createElementNS("http://www.w3.org/2000/svg", "svg");
+  svg.setAttribute("viewBox", `0 0 ${width} ${height}`);
+  const makeNode = (name, attributes) => {
+    const node = document.createElementNS(svg.namespaceURI, name);
+    Object.entries(attributes).forEach(([key, value]) => node.setAttribute(key, value));
+    svg.appendChild(node);
+    return node;
+  };
+  const makeText = (text, x, y, anchor = "middle") => {
+    const label = makeNode("text", {
+      x,
+      y,
+      fill: "#6f6259",
+      "font-size": 12,
+      "text-anchor": anchor,
+    });
+    label.textContent = text;
+  };
+
+  [0, 4, 8, 12, 16, 20, 23].forEach((hour) => {
+    makeNode("line", {
+      x1: xScale(hour),
+      x2: xScale(hour),
+      y1: padding,
+      y2: height - padding,
+      stroke: "#eadfd4",
+    });
+    makeText(`${pad(hour)}:00`, xScale(hour), height - padding + 18);
+  });
+  for (let i = 0; i <= 4; i += 1) {
+    const value = domainMin + ((domainMax - domainMin) / 4) * i;
+    makeNode("line", {
+      x1: padding,
+      x2: width - padding,
+      y1: yScale(value),
+      y2: yScale(value),
+      stroke: "#eadfd4",
+    });
+    makeText(`${Math.round(value)}`, padding - 10, yScale(value) + 4, "end");
+  }
+  makeText("Departure hour", width / 2, height - 8);
+
+  const upper = buckets.map((entry) => `${xScale(entry.hour)},${yScale(minutes(entry.p90))}`);
+  const lower = buckets
+    .slice()
+    .reverse()
+    .map((entry) => `${xScale(entry.hour)},${yScale(minutes(entry.p50))}`);
+  makeNode("polygon", {
+    points: upper.concat(lower).join(" "),
+    fill: "#cf6b4e",
+    opacity: "0.18",
+  });
+  makeNode("polyline", {
+    points: buckets.map((entry) => `${xScale(entry.hour)},${yScale(minutes(entry.p50))}`).join(" "),
+    fill: "none",
+    stroke: "#2c2a28",
+    "stroke-width": "2",
+  });
+
+  const tooltip = document.createElement("div");
+  tooltip.classList.add("chart-tooltip");
+  tooltip.setAttribute("aria-hidden", "true");
+  buckets.forEach((entry) => {
+    const dot = makeNode("circle", {
+      cx: xScale(entry.hour),
+      cy: yScale(minutes(entry.p50)),
+      r: "4",
+      fill: "#2c2a28",
+    });
+    dot.style.cursor = "pointer";
+    dot.addEventListener("mouseenter", (event) => {
+      const bounds = departureChart.getBoundingClientRect();
+      tooltip.textContent = `${pad(entry.hour)}:00 • typically ${formatDuration(entry.p50)}, 90% under ${formatDuration(entry.p90)} (${entry.count} samples)`;
+      tooltip.style.left = `${event.clientX - bounds.left + 12}px`;
+      tooltip.style.top = `${event.clientY - bounds.top - 12}px`;
+      tooltip.classList.add("is-visible");
+      tooltip.setAttribute("aria-hidden", "false");
+    });
+    dot.addEventListener("mouseleave", () => {
+      tooltip.classList.remove("is-visible");
+      tooltip.setAttribute("aria-hidden", "true");
+    });
+  });
+
+  departureChart.appendChild(svg);
+  departureChart.appendChild(tooltip);
+}
+
 function setupControls() {
   yearSelect.addEventListener("change", () => {
     buildCalendar(parseInt(yearSelect.value, 10));
     fetchCalendar();
   });
 
+  if (originSelect) {
+    originSelect.addEventListener("change", async () => {
+      await buildDestinationOptions();
+      await buildYearOptions();
+      buildCalendar(parseInt(yearSelect.value, 10));
+      fetchCalendar();
+      fetchProfile();
+    });
+  }
+
   if (directionSelect) {
     directionSelect.addEventListener("change", async () => {
       await buildYearOptions();
       buildCalendar(parseInt(yearSelect.value, 10));
       fetchCalendar();
+      fetchProfile();
     });
   }
 
   destinationSelect.addEventListener("change", () => {
     fetchCalendar();
+    fetchProfile();
   });
 
+  if (weekdaySelect) {
+    weekdaySelect.addEventListener("change", renderDepartureChart);
+  }
+
   modalClosers.forEach((closer) => {
     closer.addEventListener("click", closeModal);
   });
 }
 
 async function init() {
+  await buildOriginOptions();
   await buildDirectionOptions();
   await buildDestinationOptions();
   await buildYearOptions();
   buildCalendar(parseInt(yearSelect.value, 10));
+  if (weekdaySelect) {
+    weekdaySelect.value = `${(new Date().getDay() + 6) % 7}`;
+  }
   setupControls();
   fetchCalendar();
+  fetchProfile();
 }
 
 init();